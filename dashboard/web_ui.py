@@ -6,10 +6,15 @@ from streamlit_autorefresh import st_autorefresh
 import pandas as pd
 import json
 import os
-from collections import Counter
+import sys
+from collections import Counter, deque
 import glob
 from datetime import datetime
 
+# Rendre le package logutils importable (streamlit n'ajoute que dashboard/ au chemin)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from logutils.ring import RingReader
+
 # Rafraîchit automatiquement toutes les 10 secondes
 st_autorefresh(interval=10000, key="refresh")
 
@@ -17,18 +22,22 @@ st_autorefresh(interval=10000, key="refresh")
 CONFIG_PATH = 'config/honeypot_config.json'
 LOG_DIRECTORY = 'logs'
 LOG_FILE_PREFIX = 'honeypot'
+LIVE_RING_DIRECTORY = None
 
 try:
     with open(CONFIG_PATH, 'r') as f:
         config = json.load(f)
     LOG_DIRECTORY = config.get('log_directory', LOG_DIRECTORY)
     LOG_FILE_PREFIX = config.get('log_file_prefix', LOG_FILE_PREFIX)
+    LIVE_RING_DIRECTORY = config.get('live_ring', {}).get('directory')
 except FileNotFoundError:
     st.warning(f"Fichier de configuration {CONFIG_PATH} non trouvé. Utilisation des valeurs par défaut.")
 except json.JSONDecodeError:
     st.error(f"Erreur dans {CONFIG_PATH}. Vérifiez la syntaxe JSON.")
 
 LOG_FILE_PATTERN = os.path.join(LOG_DIRECTORY, f"{LOG_FILE_PREFIX}.json*")
+LIVE_RING_DIRECTORY = LIVE_RING_DIRECTORY or os.path.join(LOG_DIRECTORY, 'live')
+LIVE_EVENTS_MAX = 200
 
 @st.cache_data(ttl=60)
 def load_log_data():
@@ -59,12 +68,41 @@ def load_log_data():
     df = pd.DataFrame(all_log_entries)
     if 'timestamp' in df.columns:
         df['timestamp'] = pd.to_datetime(df['timestamp'])
+    # Les résumés d'agrégation (flood) représentent `repeat_count` répétitions (la première
+    # occurrence est loggée à part), les autres enregistrements un seul événement
+    if 'repeat_count' in df.columns:
+        df['count'] = pd.to_numeric(df['repeat_count'], errors='coerce').fillna(1).astype(int)
+    else:
+        df['count'] = 1
     return df
 
 # --- Interface Streamlit ---
 st.title("📊 Honeypot Activity Dashboard")
 st.markdown("Visualisation des événements enregistrés par les honeypots.")
 
+# --- Flux en direct (ring buffer en mémoire partagée, sans lecture des fichiers de log) ---
+live_enabled = st.sidebar.checkbox("Flux en direct (temps réel)", value=False)
+if live_enabled:
+    st_autorefresh(interval=1000, key="live_refresh")
+    if 'live_reader' not in st.session_state:
+        # Un lecteur par session : chaque onglet suit sa propre position dans les anneaux
+        st.session_state.live_reader = RingReader(LIVE_RING_DIRECTORY, from_start=True)
+        st.session_state.live_events = deque(maxlen=LIVE_EVENTS_MAX)
+    live_reader = st.session_state.live_reader
+    st.session_state.live_events.extend(live_reader.poll())
+
+    st.header("Flux en direct")
+    if live_reader.lost:
+        st.warning(f"{live_reader.lost} événement(s) non affiché(s) : le flux a dépassé le dashboard (voir les logs complets ci-dessous).")
+    if st.session_state.live_events:
+        live_df = pd.DataFrame(list(st.session_state.live_events)[::-1])
+        live_df['ts'] = pd.to_datetime(live_df['ts'], unit='s', utc=True)
+        st.dataframe(live_df.rename(columns={'ts': 'timestamp'}))
+    elif not live_reader.cursors:
+        st.info(f"Aucun flux en direct trouvé dans {LIVE_RING_DIRECTORY} (option live_ring désactivée ?).")
+    else:
+        st.info("En attente d'événements...")
+
 df = load_log_data()
 
 if df.empty:
@@ -94,7 +132,7 @@ else:
 
     st.header("Résumé de l'activité")
     col1, col2, col3 = st.columns(3)
-    col1.metric("Total Événements Loggués", len(filtered_df))
+    col1.metric("Total Événements Loggués", int(filtered_df['count'].sum()))
     col2.metric("Nombre d'IP uniques", filtered_df['ip'].nunique() if 'ip' in filtered_df.columns else "N/A")
     if 'timestamp' in filtered_df.columns:
         latest_event_time = filtered_df['timestamp'].max()
@@ -108,27 +146,27 @@ else:
     with col1_top:
         st.subheader("Top 10 IPs Attaquantes")
         if 'ip' in filtered_df.columns:
-            st.dataframe(filtered_df['ip'].value_counts().head(10))
+            st.dataframe(filtered_df.dropna(subset=['ip']).groupby('ip')['count'].sum().sort_values(ascending=False).head(10))
         else:
             st.info("Pas de données IP disponibles.")
 
     with col2_top:
         st.subheader("Top 10 Usernames Tentés")
         if 'user' in filtered_df.columns:
-            st.dataframe(filtered_df['user'].dropna().value_counts().head(10))
+            st.dataframe(filtered_df.dropna(subset=['user']).groupby('user')['count'].sum().sort_values(ascending=False).head(10))
         else:
             st.info("Pas de données 'user' disponibles.")
 
     with col3_top:
         st.subheader("Top 10 Passwords Tentés")
         if 'pass' in filtered_df.columns:
-            st.dataframe(filtered_df['pass'].dropna().value_counts().head(10))
+            st.dataframe(filtered_df.dropna(subset=['pass']).groupby('pass')['count'].sum().sort_values(ascending=False).head(10))
         else:
             st.info("Pas de données 'pass' disponibles.")
 
     st.header("Événements Récents")
     display_columns = ['timestamp', 'level', 'module', 'ip', 'message']
-    for col in ['user', 'pass', 'path', 'method', 'command', 'query', 'user_agent']:
+    for col in ['user', 'pass', 'path', 'method', 'command', 'query', 'user_agent', 'repeat_count']:
         if col in filtered_df.columns and col not in display_columns:
             display_columns.append(col)
 
@@ -0,0 +1,177 @@
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+
+# Champs qui distinguent deux événements "identiques" (en plus du module, de l'IP et du message)
+DEFAULT_KEY_FIELDS = ['user', 'command', 'arg', 'method', 'path', 'query', 'user_agent', 'channel_type', 'key_type']
+
+# Champs porteurs d'information nouvelle (identifiants, payloads) : ils font partie de la clé,
+# donc toute nouvelle valeur (ex: un nouveau mot de passe) est toujours loggée en entier.
+DEFAULT_NOVEL_FIELDS = ['pass', 'key_fingerprint', 'args', 'form', 'data']
+
+# En-têtes HTTP (champ `headers`) porteurs d'identifiants ou d'identité du client : comme les
+# champs ci-dessus, chaque nouvelle valeur est loggée en entier (comparaison insensible à la casse)
+DEFAULT_NOVEL_HEADERS = ['Authorization', 'Cookie', 'User-Agent']
+
+
+def _iso(ts):
+    """Même format d'horodatage que JsonFormatter."""
+    return datetime.utcfromtimestamp(ts).isoformat() + 'Z'
+
+
+def _hashable(value):
+    """Rend une valeur utilisable dans une clé (les dict/list des requêtes HTTP notamment)."""
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, sort_keys=True, ensure_ascii=False, default=str)
+    return value
+
+
+class AggregatingHandler(logging.Handler):
+    """Regroupe les événements répétés lorsque le débit dépasse un seuil.
+
+    Sous le seuil, chaque événement est transmis tel quel aux handlers cibles
+    (fichier JSON, forwarder...).
+    Au-dessus, la première occurrence d'une clé (module, ip, message, champs clés)
+    est transmise en entier ; les répétitions suivantes dans la fenêtre sont
+    seulement comptées, puis résumées à la fin de la fenêtre en un seul enregistrement
+    portant `repeat_count` (nombre de répétitions, sans la première occurrence déjà
+    transmise), `first_seen` (première occurrence), `first_repeat` et `last_seen`.
+    Les erreurs (niveau >= ERROR) ne sont jamais agrégées.
+    """
+
+    def __init__(self, targets, rate_threshold=50, window=5.0, key_fields=None, novel_fields=None,
+                 novel_headers=None, max_keys=10000):
+        super().__init__()
+        self.targets = list(targets)
+        self.rate_threshold = rate_threshold
+        self.window = window
+        self.key_fields = list(key_fields if key_fields is not None else DEFAULT_KEY_FIELDS)
+        self.novel_fields = list(novel_fields if novel_fields is not None else DEFAULT_NOVEL_FIELDS)
+        self.novel_headers = [h.lower() for h in (novel_headers if novel_headers is not None else DEFAULT_NOVEL_HEADERS)]
+        self.max_keys = max_keys
+
+        # Débit mesuré par tranches d'une seconde
+        self._bucket_second = int(time.time())
+        self._bucket_count = 0
+        self._last_rate = 0
+
+        self._window_start = time.time()
+        self._pending = {}  # clé -> {'record', 'count', 'first_repeat', 'last'}
+
+        # Le thread de vidage est démarré paresseusement, dans le processus qui logge
+        # (les threads ne survivent pas au fork des processus honeypot)
+        self._flusher_pid = None
+
+    def current_rate(self):
+        """Nombre d'événements par seconde (dernière seconde complète ou seconde en cours)."""
+        return max(self._last_rate, self._bucket_count)
+
+    def _update_rate(self, now):
+        second = int(now)
+        if second != self._bucket_second:
+            # Si plus d'une seconde s'est écoulée sans événement, le débit est retombé à 0
+            self._last_rate = self._bucket_count if second - self._bucket_second == 1 else 0
+            self._bucket_second = second
+            self._bucket_count = 0
+        self._bucket_count += 1
+
+    def _make_key(self, record):
+        extra = getattr(record, 'extra_data', {})
+        fields = tuple(_hashable(extra.get(f)) for f in self.key_fields + self.novel_fields)
+        headers = extra.get('headers')
+        if isinstance(headers, dict) and self.novel_headers:
+            lowered = {str(name).lower(): value for name, value in headers.items()}
+            fields += tuple(lowered.get(h) for h in self.novel_headers)
+        return (record.name, extra.get('ip'), record.getMessage(), fields)
+
+    def _ensure_flusher(self):
+        if self._flusher_pid == os.getpid():
+            return
+        self._flusher_pid = os.getpid()
+        t = threading.Thread(target=self._flush_loop, name='log-aggregation-flush', daemon=True)
+        t.start()
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.window)
+            self.acquire()
+            try:
+                if time.time() - self._window_start >= self.window:
+                    self._flush_pending(time.time())
+            finally:
+                self.release()
+
+    def _flush_pending(self, now):
+        """Émet un résumé pour chaque clé répétée dans la fenêtre écoulée. Appelé avec le verrou."""
+        pending, self._pending = self._pending, {}
+        self._window_start = now
+        for entry in pending.values():
+            if entry['count']:
+                self._forward(self._summary_record(entry))
+
+    def _summary_record(self, entry):
+        first = entry['record']
+        summary = logging.makeLogRecord(first.__dict__)
+        summary.created = entry['last']
+        summary.msecs = (entry['last'] - int(entry['last'])) * 1000
+        summary.exc_info = None
+        summary.exc_text = None
+        summary.extra_data = {
+            **getattr(first, 'extra_data', {}),
+            'aggregated': True,
+            'repeat_count': entry['count'],
+            'first_seen': _iso(first.created),
+            'first_repeat': _iso(entry['first_repeat']),
+            'last_seen': _iso(entry['last']),
+        }
+        return summary
+
+    def _forward(self, record):
+        for target in self.targets:
+            target.handle(record)
+
+    def emit(self, record):
+        try:
+            self._ensure_flusher()
+            now = record.created
+            self._update_rate(now)
+            if now - self._window_start >= self.window or len(self._pending) >= self.max_keys:
+                self._flush_pending(now)
+
+            if record.levelno >= logging.ERROR or self.current_rate() < self.rate_threshold:
+                self._forward(record)
+                return
+
+            key = self._make_key(record)
+            entry = self._pending.get(key)
+            if entry is None:
+                # Première occurrence dans la fenêtre : loggée en entier
+                self._pending[key] = {'record': record, 'count': 0, 'first_repeat': None, 'last': None}
+                self._forward(record)
+                return
+
+            # Répétition : on se contente de compter
+            if entry['count'] == 0:
+                entry['first_repeat'] = now
+            entry['count'] += 1
+            entry['last'] = now
+        except Exception:
+            self.handleError(record)
+
+    def flush(self):
+        self.acquire()
+        try:
+            self._flush_pending(time.time())
+        finally:
+            self.release()
+        for target in self.targets:
+            target.flush()
+
+    def close(self):
+        self.flush()
+        for target in self.targets:
+            target.close()
+        super().close()
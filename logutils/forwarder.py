@@ -0,0 +1,473 @@
+import json
+import logging
+import os
+import queue
+import socket
+import sys
+import threading
+import time
+from logutils.slots import claim_slot
+
+# Sévérités syslog (RFC 5424) correspondant aux niveaux Python
+SYSLOG_SEVERITY = {'CRITICAL': 2, 'ERROR': 3, 'WARNING': 4, 'INFO': 6, 'DEBUG': 7}
+SYSLOG_FACILITY_LOCAL0 = 16
+
+
+class _StreamTransport:
+    """Envoi de lignes JSON sur une connexion TCP ou un socket Unix (une ligne par événement).
+
+    Avec `ack`, le récepteur répond sur la même connexion par le nombre total de lignes
+    reçues depuis l'ouverture de la connexion (accusé cumulatif : un entier ASCII suivi de
+    '\n', envoyé aussi souvent qu'il le souhaite). Un lot n'est livré qu'une fois couvert
+    par un accusé : un `sendall()` réussi signifie seulement que le noyau a pris les octets.
+    """
+
+    def __init__(self, family, address, timeout, ack=True):
+        self.family = family
+        self.address = address
+        self.timeout = timeout
+        self.ack = ack
+        self.sock = None
+
+    def send(self, lines):
+        if self.sock is None:
+            self.sock = socket.socket(self.family, socket.SOCK_STREAM)
+            self.sock.settimeout(self.timeout)
+            self.sock.connect(self.address)
+            self._sent_lines = 0
+            self._acked_lines = 0
+            self._ack_buffer = b''
+        self.sock.sendall(b''.join(lines))
+        self._sent_lines += len(lines)
+        if self.ack:
+            self._wait_ack(self._sent_lines)
+
+    def _wait_ack(self, expected):
+        """Attend que le récepteur ait accusé réception de `expected` lignes (OSError sinon)."""
+        while self._acked_lines < expected:
+            data = self.sock.recv(4096)
+            if not data:
+                raise ConnectionError("Connexion fermée par le récepteur avant l'accusé de réception")
+            *acks, self._ack_buffer = (self._ack_buffer + data).split(b'\n')
+            for ack in acks:
+                try:
+                    self._acked_lines = max(self._acked_lines, int(ack))
+                except ValueError:
+                    raise ConnectionError(f"Accusé de réception invalide : {ack[:50]!r}")
+
+    def close(self):
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+
+class _SyslogTransport:
+    """Envoi syslog RFC 5424 en UDP, un datagramme par événement.
+
+    Pas d'accusé de réception en UDP : un datagramme envoyé peut être perdu sans que
+    l'émetteur le sache (livraison "au plus une fois").
+    """
+
+    def __init__(self, address, timeout):
+        self.address = address
+        self.timeout = timeout
+        self.hostname = socket.gethostname()
+        self.sock = None
+
+    def _frame(self, line):
+        try:
+            entry = json.loads(line)
+        except ValueError:
+            entry = {}
+        severity = SYSLOG_SEVERITY.get(entry.get('level'), 6)
+        pri = SYSLOG_FACILITY_LOCAL0 * 8 + severity
+        timestamp = entry.get('timestamp', '-')
+        return f"<{pri}>1 {timestamp} {self.hostname} honeypot {os.getpid()} - - ".encode('utf-8') + line.rstrip(b'\n')
+
+    def send(self, lines):
+        if self.sock is None:
+            # Socket UDP "connecté" pour que les erreurs ICMP (port fermé) remontent à l'envoi
+            self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self.sock.settimeout(self.timeout)
+            self.sock.connect(self.address)
+        for line in lines:
+            self.sock.send(self._frame(line))
+
+    def close(self):
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+
+def make_transport(transport, host='127.0.0.1', port=5140, path=None, timeout=5.0, ack=True):
+    """Construit le transport de destination ('tcp', 'unix' ou 'syslog')."""
+    if transport == 'tcp':
+        return _StreamTransport(socket.AF_INET, (host, port), timeout, ack)
+    if transport == 'unix':
+        return _StreamTransport(socket.AF_UNIX, path, timeout, ack)
+    if transport == 'syslog':
+        return _SyslogTransport((host, port), timeout)
+    raise ValueError(f"Transport de forwarding inconnu : {transport}")
+
+
+class Spool:
+    """File d'attente sur disque, découpée en segments, avec position de livraison persistante.
+
+    Les lignes sont ajoutées à la fin du dernier segment. La position de lecture
+    (segment, offset) n'avance qu'une fois le lot livré (accusé de réception du récepteur
+    en TCP/Unix, simple envoi en syslog UDP) et est enregistrée dans `offsets.json` :
+    après un redémarrage, l'envoi reprend à la dernière position livrée.
+    Écrit par un thread et lu par un autre : les méthodes publiques sont protégées par un verrou.
+    """
+
+    # Taille des lectures lors du renvoi
+    READ_CHUNK = 256 * 1024
+
+    def __init__(self, directory, segment_bytes=16 * 1024 * 1024, max_bytes=512 * 1024 * 1024):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.max_bytes = max_bytes
+        self.dropped_bytes = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._offsets_path = os.path.join(directory, 'offsets.json')
+
+        segments = self._segments()
+        try:
+            with open(self._offsets_path, 'r') as f:
+                state = json.load(f)
+            self.read_segment, self.read_offset = state['segment'], state['offset']
+        except (FileNotFoundError, ValueError, KeyError):
+            self.read_segment, self.read_offset = (segments[0] if segments else 0), 0
+        if segments and self.read_segment not in segments:
+            # Segment livré supprimé entre-temps : reprendre au suivant
+            later = [i for i in segments if i > self.read_segment]
+            if later:
+                self.read_segment, self.read_offset = later[0], 0
+        self.write_segment = max(segments + [self.read_segment])
+        self._writer = open(self._segment_path(self.write_segment), 'ab')
+        # Taille totale tenue à jour (évite de lister le répertoire à chaque ajout)
+        self._bytes = self.size()
+
+    def _segments(self):
+        return sorted(int(name[:-4]) for name in os.listdir(self.directory) if name.endswith('.seg'))
+
+    def _segment_path(self, index):
+        return os.path.join(self.directory, f"{index:08d}.seg")
+
+    def size(self):
+        return sum(os.path.getsize(self._segment_path(i)) for i in self._segments())
+
+    def pending(self):
+        """Vrai s'il reste des données non livrées."""
+        with self._lock:
+            if self.read_segment < self.write_segment:
+                return True
+            return self.read_offset < self._writer.tell()
+
+    def append(self, lines):
+        with self._lock:
+            data = b''.join(lines)
+            self._writer.write(data)
+            self._writer.flush()
+            self._bytes += len(data)
+            if self._writer.tell() >= self.segment_bytes:
+                self._writer.close()
+                self.write_segment += 1
+                self._writer = open(self._segment_path(self.write_segment), 'ab')
+            self._enforce_limit()
+
+    def _enforce_limit(self):
+        """Supprime les segments les plus anciens si le spool dépasse sa taille maximale."""
+        while self._bytes > self.max_bytes:
+            oldest = self._segments()[0]
+            if oldest == self.write_segment:
+                break
+            self.dropped_bytes += self._remove_segment(oldest)
+            if self.read_segment <= oldest:
+                self._save_position(oldest + 1, 0)
+
+    def read_batch(self, max_lines):
+        """Lit jusqu'à `max_lines` lignes à partir de la position livrée.
+
+        Renvoie (lignes, position) ; la position est à passer à `commit` une fois les lignes envoyées.
+        """
+        with self._lock:
+            segment, offset = self.read_segment, self.read_offset
+            lines = []
+            while len(lines) < max_lines:
+                if not os.path.exists(self._segment_path(segment)):
+                    if segment < self.write_segment:
+                        segment, offset = segment + 1, 0
+                        continue
+                    break
+                with open(self._segment_path(segment), 'rb') as f:
+                    f.seek(offset)
+                    buffer = b''
+                    while len(lines) < max_lines:
+                        chunk = f.read(self.READ_CHUNK)
+                        if not chunk:
+                            break
+                        buffer += chunk
+                        # La dernière ligne sans '\n' est incomplète (en cours d'écriture ou coupée par le bloc)
+                        complete = buffer.split(b'\n')
+                        buffer = complete.pop()
+                        for line in complete[:max_lines - len(lines)]:
+                            lines.append(line + b'\n')
+                            offset += len(line) + 1
+                if len(lines) < max_lines and segment < self.write_segment:
+                    segment, offset = segment + 1, 0
+                else:
+                    break
+            return lines, (segment, offset)
+
+    def commit(self, position):
+        """Marque comme livrées les lignes lues jusqu'à `position` et supprime les segments entièrement livrés."""
+        with self._lock:
+            segment, offset = position
+            if (segment, offset) < (self.read_segment, self.read_offset):
+                return # Position déjà dépassée (segments supprimés par la limite de taille pendant l'envoi)
+            for index in self._segments():
+                if index < segment:
+                    self._remove_segment(index)
+            self._save_position(segment, offset)
+
+    def _remove_segment(self, index):
+        size = os.path.getsize(self._segment_path(index))
+        os.remove(self._segment_path(index))
+        self._bytes -= size
+        return size
+
+    def _save_position(self, segment, offset):
+        self.read_segment, self.read_offset = segment, offset
+        tmp_path = self._offsets_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'segment': segment, 'offset': offset}, f)
+        os.replace(tmp_path, self._offsets_path)
+
+    def close(self):
+        with self._lock:
+            self._writer.close()
+
+
+class ForwardingHandler(logging.Handler):
+    """Transmet les événements par lots vers un SIEM (syslog, TCP ou socket Unix).
+
+    `emit` se contente de déposer l'enregistrement dans une file en mémoire et ne bloque
+    jamais. Deux threads se partagent ensuite le travail :
+    - le thread de spool vide la file en continu, regroupe les lignes par lots de
+      `batch_size` ou toutes les `flush_interval` secondes et les écrit dans un spool sur
+      disque ; il ne dépend jamais de la destination, donc une destination lente ou
+      indisponible remplit le spool et non la file ;
+    - le thread d'envoi transmet le spool dans l'ordre et n'avance la position livrée
+      qu'une fois le lot livré, y compris après un redémarrage.
+    Avec un transport à accusé de réception (TCP/Unix avec `ack`), la livraison est "au moins
+    une fois" (un lot dont l'accusé n'arrive pas est renvoyé en entier, d'où de possibles
+    doublons) ; en syslog UDP, elle est "au plus une fois".
+    Si la file est pleine (disque trop lent) ou si un lot échoue alors que le spool ne peut
+    pas être ouvert, l'événement n'est pas transmis (il reste dans le fichier de log) : le
+    compteur `dropped` est incrémenté et signalé sur la sortie d'erreur.
+    """
+
+    # Intervalle minimal entre deux signalements d'événements non transmis
+    DROP_REPORT_INTERVAL = 10.0
+
+    def __init__(self, transport, spool_directory, batch_size=500, flush_interval=1.0, queue_size=10000,
+                 segment_bytes=16 * 1024 * 1024, max_spool_bytes=512 * 1024 * 1024, max_retry_delay=30.0):
+        super().__init__()
+        self.transport = transport
+        self.spool_directory = spool_directory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.segment_bytes = segment_bytes
+        self.max_spool_bytes = max_spool_bytes
+        self.max_retry_delay = max_retry_delay
+        self.queue = queue.Queue(maxsize=queue_size)
+
+        self.sent = 0
+        self.dropped = 0
+        self.spool = None
+        self._reported_dropped = 0
+        self._report_at = 0.0
+        self._retry_at = 0.0
+        self._retry_delay = 1.0
+        self._slot_lock = None
+        self._spool_retry_at = 0.0
+        self._sender_pid = None
+        self._spooler = None
+        self._sender = None
+        self._stop = threading.Event()
+        self._spooled = threading.Event()
+
+    def emit(self, record):
+        try:
+            self._ensure_threads()
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+        except Exception:
+            self.handleError(record)
+
+    def _ensure_threads(self):
+        # Démarrés paresseusement dans le processus qui logge (les threads ne survivent pas au fork).
+        # Le spool est ouvert par le thread de spool : aucun accès disque dans emit.
+        if self._sender_pid == os.getpid():
+            return
+        self._stop = threading.Event()
+        self._spooled = threading.Event()
+        self.spool = None
+        self._spool_retry_at = 0.0
+        self._spooler = threading.Thread(target=self._spool_loop, name='log-forwarder-spool', daemon=True)
+        self._sender = threading.Thread(target=self._send_loop, name='log-forwarder', daemon=True)
+        self._spooler.start()
+        self._sender.start()
+        # Marqué seulement une fois les threads démarrés : sinon, nouvel essai au prochain événement
+        self._sender_pid = os.getpid()
+
+    def _open_spool(self):
+        """Réserve le spool du processus (un par processus honeypot), avec nouvel essai en cas d'échec."""
+        if time.monotonic() < self._spool_retry_at:
+            return
+        lock = None
+        try:
+            directory, lock = claim_slot(self.spool_directory)
+            self.spool = Spool(directory, self.segment_bytes, self.max_spool_bytes)
+            self._slot_lock = lock
+        except OSError as e:
+            if lock is not None:
+                lock.close()
+            self._spool_retry_at = time.monotonic() + self.max_retry_delay
+            print(f"Spool du forwarder de logs indisponible ({self.spool_directory}), "
+                  f"envoi sans reprise, nouvel essai dans {self.max_retry_delay:.0f}s : {e}")
+
+    def _line(self, record):
+        # Formatage JSON dans le thread de spool, hors du chemin critique des honeypots
+        return (self.format(record) + '\n').encode('utf-8')
+
+    def _collect(self):
+        """Attend le premier événement puis regroupe jusqu'à `batch_size` lignes ou `flush_interval` secondes."""
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(self._line(self.queue.get(timeout=timeout)))
+            except queue.Empty:
+                break
+        return batch
+
+    def _store(self, batch):
+        if self.spool is None:
+            # Spool indisponible : envoi direct, les lots en échec ne peuvent pas être rejoués
+            if not self._send(batch):
+                self.dropped += len(batch)
+            return
+        self.spool.append(batch)
+        self._spooled.set()
+
+    def _report_dropped(self, force=False):
+        """Signale les événements non transmis depuis le dernier signalement."""
+        if self.dropped == self._reported_dropped:
+            return
+        if not force and time.monotonic() < self._report_at:
+            return
+        print(f"[!] Forwarder de logs : {self.dropped - self._reported_dropped} événement(s) non transmis "
+              f"(total {self.dropped}) ; ils restent dans le fichier de log", file=sys.stderr)
+        self._reported_dropped = self.dropped
+        self._report_at = time.monotonic() + self.DROP_REPORT_INTERVAL
+
+    def _spool_loop(self):
+        while not self._stop.is_set():
+            try:
+                if self.spool is None:
+                    self._open_spool()
+                batch = self._collect()
+                if batch:
+                    self._store(batch)
+                self._report_dropped()
+            except Exception as e:
+                # Ne jamais laisser mourir le thread de spool (ex: disque plein)
+                print(f"Erreur du forwarder de logs : {e}")
+                time.sleep(self.flush_interval)
+        # Arrêt : les événements encore en mémoire vont dans le spool, pour être rejoués
+        pending = []
+        while True:
+            try:
+                pending.append(self._line(self.queue.get_nowait()))
+            except queue.Empty:
+                break
+        try:
+            if pending:
+                self._store(pending)
+        except Exception as e:
+            self.dropped += len(pending)
+            print(f"Erreur du forwarder de logs : {e}")
+        self._report_dropped(force=True)
+
+    def _send(self, lines):
+        """Tente un envoi, acquitté par le récepteur si le transport le permet.
+
+        En cas d'échec, l'envoi suivant est retardé (délai exponentiel).
+        """
+        if time.monotonic() < self._retry_at:
+            return False
+        try:
+            self.transport.send(lines)
+        except OSError:
+            self.transport.close()
+            self._retry_at = time.monotonic() + self._retry_delay
+            self._retry_delay = min(self._retry_delay * 2, self.max_retry_delay)
+            return False
+        self._retry_delay = 1.0
+        self.sent += len(lines)
+        return True
+
+    def _send_spooled(self, deadline=None):
+        """Transmet le spool dans l'ordre jusqu'à ce qu'il soit vide, qu'un envoi échoue ou `deadline`."""
+        while self.spool.pending():
+            if deadline is not None and time.monotonic() > deadline:
+                return
+            lines, position = self.spool.read_batch(self.batch_size)
+            if not lines:
+                # Segments vides : avancer quand même la position livrée
+                self.spool.commit(position)
+                return
+            if not self._send(lines):
+                return
+            self.spool.commit(position)
+
+    def _send_loop(self):
+        while True:
+            # Dernier passage une fois le thread de spool arrêté (tout est alors dans le spool)
+            finishing = self._stop.is_set() and not self._spooler.is_alive()
+            try:
+                if self.spool is not None:
+                    self._send_spooled(time.monotonic() + self.transport.timeout if finishing else None)
+            except Exception as e:
+                print(f"Erreur du forwarder de logs : {e}")
+                time.sleep(self.flush_interval)
+            if finishing:
+                return
+            # Réveillé par chaque nouveau lot, ou à la prochaine tentative après un échec
+            timeout = self.flush_interval
+            if self._retry_at > time.monotonic():
+                timeout = min(timeout, self._retry_at - time.monotonic())
+            self._spooled.wait(timeout)
+            self._spooled.clear()
+
+    def close(self):
+        # Les événements encore en mémoire sont écrits dans le spool ; ce qui n'a pas pu être
+        # livré dans le délai est rejoué au prochain démarrage
+        if self._sender_pid == os.getpid():
+            self._stop.set()
+            self._spooler.join(self.flush_interval + 1.0)
+            self._spooled.set()
+            self._sender.join(2 * self.transport.timeout + 1.0)
+            # Si un thread est encore bloqué (disque ou envoi), on ne ferme rien sous ses pieds
+            if not self._spooler.is_alive() and not self._sender.is_alive():
+                if self.spool is not None:
+                    self.spool.close()
+                self.transport.close()
+        super().close()
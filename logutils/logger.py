@@ -3,36 +3,11 @@ import logging.handlers
 import json
 import os
 from datetime import datetime
+from logutils.aggregation import AggregatingHandler
+from logutils.forwarder import ForwardingHandler, make_transport
+from logutils.ring import RingBufferHandler
 
-# Charger la configuration pour déterminer où logger
-try:
-    with open('config/honeypot_config.json', 'r') as f:
-        config = json.load(f)
-    LOG_DIRECTORY = config.get('log_directory', 'logs')
-    LOG_FILE_PREFIX = config.get('log_file_prefix', 'honeypot')
-except FileNotFoundError:
-    print("Fichier de configuration config/honeypot_config.json non trouvé. Utilisation des valeurs par défaut.")
-    LOG_DIRECTORY = 'logs'
-    LOG_FILE_PREFIX = 'honeypot'
-except json.JSONDecodeError:
-    print("Erreur lors de la lecture de config/honeypot_config.json. Utilisation des valeurs par défaut.")
-    LOG_DIRECTORY = 'logs'
-    LOG_FILE_PREFIX = 'honeypot'
-
-# Créer le répertoire de logs s'il n'existe pas
-os.makedirs(LOG_DIRECTORY, exist_ok=True)
-
-# Configuration du logger principal
-log_file_path = os.path.join(LOG_DIRECTORY, f"{LOG_FILE_PREFIX}.json")
-
-# Utiliser TimedRotatingFileHandler pour la rotation quotidienne
-handler = logging.handlers.TimedRotatingFileHandler(
-    log_file_path,
-    when="midnight",
-    interval=1,
-    backupCount=30, # Garde les logs des 30 derniers jours
-    encoding='utf-8'
-)
+CONFIG_PATH = 'config/honeypot_config.json'
 
 # Formatter pour écrire en JSON
 class JsonFormatter(logging.Formatter):
@@ -46,19 +21,117 @@ class JsonFormatter(logging.Formatter):
         }
         return json.dumps(log_record, ensure_ascii=False)
 
-handler.setFormatter(JsonFormatter())
+def load_logging_config(config_path=CONFIG_PATH):
+    """Charge la configuration pour déterminer où logger."""
+    try:
+        with open(config_path, 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        print(f"Fichier de configuration {config_path} non trouvé. Utilisation des valeurs par défaut.")
+    except json.JSONDecodeError:
+        print(f"Erreur lors de la lecture de {config_path}. Utilisation des valeurs par défaut.")
+    return {}
+
+def build_handlers(config):
+    """Construit la chaîne de handlers (fichier JSON, forwarder, flux en direct, agrégation)."""
+    log_directory = config.get('log_directory', 'logs')
+    log_file_prefix = config.get('log_file_prefix', 'honeypot')
+    aggregation_config = config.get('log_aggregation', {})
+    forwarding_config = config.get('log_forwarding', {})
+    live_ring_config = config.get('live_ring', {})
+
+    # Créer le répertoire de logs s'il n'existe pas
+    os.makedirs(log_directory, exist_ok=True)
+
+    # Utiliser TimedRotatingFileHandler pour la rotation quotidienne
+    # (delay=True : le fichier n'est ouvert qu'au premier événement)
+    handler = logging.handlers.TimedRotatingFileHandler(
+        os.path.join(log_directory, f"{log_file_prefix}.json"),
+        when="midnight",
+        interval=1,
+        backupCount=30, # Garde les logs des 30 derniers jours
+        encoding='utf-8',
+        delay=True
+    )
+    handler.setFormatter(JsonFormatter())
+    handlers = [handler]
+
+    # Transmission des événements vers un SIEM (par lots, avec spool sur disque)
+    if forwarding_config.get('enabled', False):
+        forwarder = ForwardingHandler(
+            make_transport(
+                forwarding_config.get('transport', 'tcp'),
+                host=forwarding_config.get('host', '127.0.0.1'),
+                port=forwarding_config.get('port', 5140),
+                path=forwarding_config.get('path'),
+                timeout=forwarding_config.get('timeout', 5.0),
+                ack=forwarding_config.get('ack', True)
+            ),
+            spool_directory=forwarding_config.get('spool_directory', os.path.join(log_directory, 'spool')),
+            batch_size=forwarding_config.get('batch_size', 500),
+            flush_interval=forwarding_config.get('flush_interval', 1.0),
+            queue_size=forwarding_config.get('queue_size', 10000),
+            segment_bytes=forwarding_config.get('segment_bytes', 16 * 1024 * 1024),
+            max_spool_bytes=forwarding_config.get('max_spool_bytes', 512 * 1024 * 1024)
+        )
+        forwarder.setFormatter(JsonFormatter())
+        handlers.append(forwarder)
+
+    # Flux en direct en mémoire partagée (dashboard, `python -m logutils.ring tail`)
+    if live_ring_config.get('enabled', False):
+        handlers.append(RingBufferHandler(
+            live_ring_config.get('directory', os.path.join(log_directory, 'live')),
+            slot_count=live_ring_config.get('slots', 4096),
+            slot_size=live_ring_config.get('slot_size', 512)
+        ))
+
+    # Agrégation des événements répétés en cas de flood (brute-force, scans)
+    if aggregation_config.get('enabled', False):
+        handlers = [AggregatingHandler(
+            handlers,
+            rate_threshold=aggregation_config.get('rate_threshold', 50),
+            window=aggregation_config.get('window_seconds', 5.0),
+            key_fields=aggregation_config.get('key_fields'),
+            novel_fields=aggregation_config.get('novel_fields'),
+            novel_headers=aggregation_config.get('novel_headers'),
+            max_keys=aggregation_config.get('max_keys', 10000)
+        )]
+    return handlers
+
+# Handlers partagés par tous les loggers, construits au premier appel de get_logger
+# (et non à l'import, pour ne rien ouvrir dans les processus qui ne loggent pas)
+_handlers = None
+
+# Noms des loggers configurés par get_logger (pour changer leur niveau à chaud)
+_logger_names = set()
+_log_level = logging.INFO # Niveau de log par défaut
 
 def get_logger(name):
     """Obtient une instance de logger configurée."""
+    global _handlers
+    if _handlers is None:
+        _handlers = build_handlers(load_logging_config())
     logger = logging.getLogger(name)
     # Éviter d'ajouter plusieurs fois le même handler si get_logger est appelé plusieurs fois
     if not logger.handlers:
-        logger.addHandler(handler)
-        logger.setLevel(logging.INFO) # Niveau de log par défaut
+        for h in _handlers:
+            logger.addHandler(h)
+        logger.setLevel(_log_level)
         # Empêcher la propagation vers le logger root pour éviter les doublons si root est configuré
         logger.propagate = False
+        _logger_names.add(name)
     return logger
 
+def set_log_level(level):
+    """Change le niveau de tous les loggers honeypot (ex: 'DEBUG', 'WARNING')."""
+    global _log_level
+    level = logging.getLevelName(level.upper()) if isinstance(level, str) else level
+    if not isinstance(level, int):
+        return
+    _log_level = level
+    for name in _logger_names:
+        logging.getLogger(name).setLevel(level)
+
 # Exemple d'utilisation (sera retiré plus tard)
 # if __name__ == "__main__":
 #     ssh_logger = get_logger('ssh')
@@ -0,0 +1,306 @@
+import argparse
+import glob
+import json
+import logging
+import mmap
+import os
+import random
+import struct
+import sys
+import time
+from logutils.slots import claim_slot
+
+# Flux d'événements en direct, en mémoire partagée (fichiers mmap de taille fixe).
+#
+# Chaque processus honeypot écrit dans son propre anneau (un seul écrivain par anneau, donc
+# aucun verrou entre processus). Les lecteurs (dashboard, `python -m logutils.ring tail`)
+# suivent tous les anneaux, chacun avec sa propre position, et détectent quand l'écrivain
+# les a dépassés (événements perdus).
+#
+# En-tête : magic, version, taille d'un emplacement, nombre d'emplacements, génération, write_seq
+# Emplacement : seq (numéro de l'événement, ou WRITING pendant l'écriture), longueur, JSON compact
+HEADER = struct.Struct('<4sIIIQQ')
+HEADER_SIZE = 64
+WRITE_SEQ_OFFSET = 24
+SLOT_HEADER = struct.Struct('<QI')
+MAGIC = b'HPRB'
+VERSION = 1
+WRITING = 0xFFFFFFFFFFFFFFFF
+RING_FILE = 'ring.buf'
+# Taille minimale d'un emplacement : de quoi loguer un événement tronqué utile
+MIN_SLOT_SIZE = 128
+
+# Champs repris dans les enregistrements compacts (les en-têtes HTTP complets restent dans le fichier de log)
+LIVE_FIELDS = ('ip', 'user', 'pass', 'path', 'method', 'command', 'arg', 'query', 'user_agent', 'repeat_count')
+
+
+def _encode(event):
+    return json.dumps(event, ensure_ascii=False, separators=(',', ':'), default=str).encode('utf-8')
+
+
+def compact_event(record, max_bytes):
+    """Encode un LogRecord en JSON compact tenant dans un emplacement."""
+    extra = getattr(record, 'extra_data', {})
+    event = {'ts': record.created, 'level': record.levelname, 'module': record.name, 'message': record.getMessage()}
+    for field in LIVE_FIELDS:
+        if field in extra:
+            event[field] = extra[field]
+    data = _encode(event)
+    if len(data) > max_bytes:
+        # Trop long : ne garder que l'essentiel, message tronqué en caractères (et non le JSON
+        # encodé en octets, qui deviendrait invalide) à la plus grande longueur qui tient
+        message = record.getMessage()
+        event = {k: event[k] for k in ('ts', 'level', 'module') if k in event}
+        event['ip'] = extra.get('ip')
+        event['truncated'] = True
+        low, high = 0, min(len(message), max_bytes)
+        while low < high:
+            middle = (low + high + 1) // 2
+            event['message'] = message[:middle]
+            if len(_encode(event)) <= max_bytes:
+                low = middle
+            else:
+                high = middle - 1
+        event['message'] = message[:low]
+        data = _encode(event)
+        if len(data) > max_bytes:
+            # Emplacement trop petit même pour l'essentiel : enregistrement minimal de taille fixe
+            data = _encode({'ts': record.created, 'truncated': True})
+    return data
+
+
+def _check_geometry(slot_count, slot_size):
+    if slot_count < 1:
+        raise ValueError(f"live_ring.slots doit être >= 1 (reçu {slot_count})")
+    if slot_size < MIN_SLOT_SIZE:
+        raise ValueError(f"live_ring.slot_size doit être >= {MIN_SLOT_SIZE} octets (reçu {slot_size})")
+
+
+class RingWriter:
+    """Écrivain unique d'un anneau."""
+
+    def __init__(self, path, slot_count=4096, slot_size=512):
+        _check_geometry(slot_count, slot_size)
+        self.slot_count = slot_count
+        self.slot_size = slot_size
+        size = HEADER_SIZE + slot_count * slot_size
+        if self._reuse(path, size):
+            return
+        # Nouvel anneau (ou géométrie différente) : créé à côté puis renommé. Le fichier n'est
+        # jamais redimensionné en place : un lecteur qui a projeté l'ancien le garde intact
+        # (pas de SIGBUS), voit le changement d'inode, et ne voit jamais d'en-tête incomplet.
+        tmp_path = path + '.tmp'
+        fd = os.open(tmp_path, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            os.ftruncate(fd, size)
+            self.mm = mmap.mmap(fd, size)
+        finally:
+            os.close(fd)
+        self.write_seq = 0
+        HEADER.pack_into(self.mm, 0, MAGIC, VERSION, slot_size, slot_count, random.getrandbits(63), 0)
+        os.replace(tmp_path, path)
+
+    def _reuse(self, path, size):
+        """Reprise après redémarrage d'un anneau de même géométrie : la numérotation continue pour les lecteurs en cours."""
+        try:
+            fd = os.open(path, os.O_RDWR)
+        except FileNotFoundError:
+            return False
+        try:
+            if os.fstat(fd).st_size != size:
+                return False
+            mm = mmap.mmap(fd, size)
+        finally:
+            os.close(fd)
+        magic, version, s_size, s_count, _, write_seq = HEADER.unpack_from(mm, 0)
+        if (magic, version, s_size, s_count) != (MAGIC, VERSION, self.slot_size, self.slot_count):
+            mm.close()
+            return False
+        self.mm = mm
+        self.write_seq = write_seq
+        return True
+
+    def write(self, payload):
+        """Publie un événement. Renvoie False (événement ignoré) s'il ne tient pas dans un emplacement."""
+        if len(payload) > self.slot_size - SLOT_HEADER.size:
+            return False
+        seq = self.write_seq
+        offset = HEADER_SIZE + (seq % self.slot_count) * self.slot_size
+        # Marquer l'emplacement en cours d'écriture, écrire, puis publier le numéro
+        SLOT_HEADER.pack_into(self.mm, offset, WRITING, 0)
+        self.mm[offset + SLOT_HEADER.size:offset + SLOT_HEADER.size + len(payload)] = payload
+        SLOT_HEADER.pack_into(self.mm, offset, seq, len(payload))
+        self.write_seq = seq + 1
+        struct.pack_into('<Q', self.mm, WRITE_SEQ_OFFSET, self.write_seq)
+        return True
+
+    def close(self):
+        self.mm.close()
+
+
+class RingBufferHandler(logging.Handler):
+    """Publie chaque événement dans l'anneau du processus courant."""
+
+    def __init__(self, directory, slot_count=4096, slot_size=512):
+        super().__init__()
+        _check_geometry(slot_count, slot_size)
+        self.directory = directory
+        self.slot_count = slot_count
+        self.slot_size = slot_size
+        self._writer = None
+        self._writer_pid = None
+        self._slot_lock = None
+        self.dropped = 0 # Événements trop grands pour un emplacement
+
+    def emit(self, record):
+        try:
+            # Anneau ouvert paresseusement, dans le processus qui logge
+            if self._writer_pid != os.getpid():
+                directory, self._slot_lock = claim_slot(self.directory)
+                self._writer = RingWriter(os.path.join(directory, RING_FILE), self.slot_count, self.slot_size)
+                self._writer_pid = os.getpid()
+            if not self._writer.write(compact_event(record, self.slot_size - SLOT_HEADER.size)):
+                self.dropped += 1
+        except Exception:
+            self.handleError(record)
+
+    def close(self):
+        if self._writer is not None and self._writer_pid == os.getpid():
+            self._writer.close()
+            self._writer = None
+        super().close()
+
+
+class _RingCursor:
+    """Position d'un lecteur dans un anneau."""
+
+    def __init__(self, path, from_start):
+        self.path = path
+        self.mm = None
+        write_seq = self._map()
+        if write_seq is None:
+            raise ValueError("Anneau en cours de création")
+        self.position = max(0, write_seq - self.slot_count) if from_start else write_seq
+
+    def _map(self):
+        """Projette le fichier courant de l'anneau et relit sa géométrie.
+
+        Renvoie le write_seq, ou None si l'en-tête n'est pas (encore) valide.
+        """
+        with open(self.path, 'rb') as f:
+            inode = os.fstat(f.fileno()).st_ino
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, slot_size, slot_count, generation, write_seq = HEADER.unpack_from(mm, 0)
+        if (magic != MAGIC or version != VERSION or slot_count == 0 or slot_size <= SLOT_HEADER.size
+                or len(mm) < HEADER_SIZE + slot_count * slot_size):
+            mm.close()
+            return None
+        if self.mm is not None:
+            self.mm.close()
+        self.mm, self.inode = mm, inode
+        self.slot_size, self.slot_count, self.generation = slot_size, slot_count, generation
+        return write_seq
+
+    def read(self):
+        """Renvoie (événements, nombre d'événements perdus) depuis la dernière lecture."""
+        _, _, _, _, generation, write_seq = HEADER.unpack_from(self.mm, 0)
+        try:
+            replaced = os.stat(self.path).st_ino != self.inode
+        except OSError:
+            replaced = False
+        if replaced or generation != self.generation or write_seq < self.position:
+            # Anneau recréé par un nouvel écrivain (géométrie éventuellement différente) :
+            # reprojection, et tout son contenu est nouveau
+            try:
+                write_seq = self._map()
+            except (OSError, ValueError, struct.error):
+                write_seq = None
+            if write_seq is None:
+                return [], 0
+            self.position = max(0, write_seq - self.slot_count)
+        events, lost = [], 0
+        oldest = max(0, write_seq - self.slot_count)
+        if self.position < oldest:
+            lost += oldest - self.position
+            self.position = oldest
+        while self.position < write_seq:
+            offset = HEADER_SIZE + (self.position % self.slot_count) * self.slot_size
+            seq, length = SLOT_HEADER.unpack_from(self.mm, offset)
+            data = bytes(self.mm[offset + SLOT_HEADER.size:offset + SLOT_HEADER.size + min(length, self.slot_size - SLOT_HEADER.size)])
+            # Emplacement réécrit pendant la lecture : l'écrivain nous a dépassés
+            if seq != self.position or SLOT_HEADER.unpack_from(self.mm, offset)[0] != seq:
+                lost += 1
+            else:
+                try:
+                    events.append(json.loads(data))
+                except ValueError:
+                    lost += 1
+            self.position += 1
+        return events, lost
+
+    def close(self):
+        self.mm.close()
+
+
+class RingReader:
+    """Suit tous les anneaux d'un répertoire. Chaque lecteur a ses propres positions."""
+
+    def __init__(self, directory, from_start=False):
+        self.directory = directory
+        self.from_start = from_start
+        self.cursors = {}
+        self.lost = 0
+        self._started = False
+
+    def _discover(self):
+        for path in glob.glob(os.path.join(self.directory, '*', RING_FILE)):
+            if path not in self.cursors:
+                try:
+                    # Les anneaux apparus après le démarrage du lecteur sont lus depuis le début
+                    self.cursors[path] = _RingCursor(path, self.from_start or self._started)
+                except (OSError, ValueError, struct.error):
+                    pass # Anneau en cours de création
+        self._started = True
+
+    def poll(self):
+        """Renvoie les nouveaux événements de tous les anneaux, triés par horodatage."""
+        self._discover()
+        events = []
+        for cursor in self.cursors.values():
+            new_events, lost = cursor.read()
+            events.extend(new_events)
+            self.lost += lost
+        events.sort(key=lambda e: e.get('ts', 0))
+        return events
+
+    def close(self):
+        for cursor in self.cursors.values():
+            cursor.close()
+        self.cursors = {}
+
+
+def tail(directory, from_start=False, interval=0.2):
+    """Affiche les événements en direct (équivalent de `tail -f`, sans lecture de fichier de log)."""
+    reader = RingReader(directory, from_start=from_start)
+    reported_lost = 0
+    try:
+        while True:
+            for event in reader.poll():
+                print(json.dumps(event, ensure_ascii=False), flush=True)
+            if reader.lost != reported_lost:
+                print(f"[!] {reader.lost - reported_lost} événement(s) perdu(s) (lecteur dépassé)", file=sys.stderr)
+                reported_lost = reader.lost
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        reader.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Flux d'événements honeypot en direct")
+    parser.add_argument('command', choices=['tail'])
+    parser.add_argument('--directory', default='logs/live', help="Répertoire des anneaux (live_ring.directory)")
+    parser.add_argument('--from-start', action='store_true', help="Afficher aussi les événements encore présents dans les anneaux")
+    args = parser.parse_args()
+    tail(args.directory, from_start=args.from_start)
@@ -0,0 +1,32 @@
+import os
+
+try:
+    import fcntl
+except ImportError: # Windows : pas de verrouillage, un seul emplacement
+    fcntl = None
+
+
+def claim_slot(base_directory):
+    """Réserve un sous-répertoire numéroté de `base_directory` pour le processus courant.
+
+    Chaque processus honeypot a ainsi ses propres fichiers (spool, ring buffer...). Le verrou
+    est relâché à la fin du processus : le prochain processus qui réserve l'emplacement
+    reprend les données laissées par le précédent.
+    Renvoie (répertoire, fichier de verrou à garder ouvert).
+    """
+    if fcntl is None:
+        directory = os.path.join(base_directory, '0')
+        os.makedirs(directory, exist_ok=True)
+        return directory, None
+    slot = 0
+    while True:
+        directory = os.path.join(base_directory, str(slot))
+        os.makedirs(directory, exist_ok=True)
+        lock = open(os.path.join(directory, 'lock'), 'w')
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock.close()
+            slot += 1
+            continue
+        return directory, lock
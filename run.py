@@ -1,33 +1,33 @@
+import time
+
+# Instant de lancement de run.py, référence des mesures de --profile-startup
+STARTUP_T0 = time.time()
+
+import argparse
+import importlib
 import json
+import logging
 import multiprocessing
-import time
+import os
+import socket
 import signal
 import sys
-from rich.live import Live
-from rich.table import Table
-from rich.panel import Panel
-from rich.layout import Layout
-from rich.console import Console
-
-# Importer les fonctions de démarrage des honeypots
-# Gérer les ImportError si un module est désactivé ou non implémenté
-try:
-    from services.ssh_honeypot import start_ssh_honeypot
-except ImportError:
-    start_ssh_honeypot = None
-
-try:
-    from services.http_honeypot import start_http_honeypot
-except ImportError:
-    start_http_honeypot = None
-
-try:
-    from services.ftp_honeypot import start_ftp_honeypot
-except ImportError:
-    start_ftp_honeypot = None
+
+# Fonctions de démarrage des honeypots ("module:fonction").
+# Chaque module n'est importé que dans son propre processus, et seulement si le service est
+# activé : paramiko, Flask et pyftpdlib ne ralentissent ni run.py ni les autres services.
+SERVICES = {
+    'SSH': 'services.ssh_honeypot:start_ssh_honeypot',
+    'HTTP': 'services.http_honeypot:start_http_honeypot',
+    'FTP': 'services.ftp_honeypot:start_ftp_honeypot'
+}
+
+from services import lifecycle
+
+CONFIG_PATH = 'config/honeypot_config.json'
 
 # Charger la configuration
-def load_config(config_path='config/honeypot_config.json'):
+def load_config(config_path=CONFIG_PATH):
     try:
         with open(config_path, 'r') as f:
             return json.load(f)
@@ -41,114 +41,366 @@ def load_config(config_path='config/honeypot_config.json'):
 config = load_config()
 
 # Liste pour garder une trace des processus démarrés
+# Chaque entrée : name, process, args, sessions (compteur partagé), state ('running' ou 'draining')
 processes = []
 
-def shutdown(signum, frame):
-    """Arrête proprement tous les processus honeypot."""
-    print("\n[*] Arrêt des honeypots...")
+# Sockets d'écoute détenus par le processus principal et hérités par les processus honeypot,
+# pour que les ports restent ouverts pendant un rechargement : name -> {'addr', 'sock'}
+listening_sockets = {}
+
+# Statistiques des rechargements à chaud (affichées dans le panneau de contrôle)
+reload_stats = {'count': 0, 'last_latency_ms': None, 'dropped': 0, 'last_message': "Aucun rechargement"}
+reload_requested = None # Instant (time.time) de réception du dernier SIGHUP non traité
+
+# Rechargement en cours de mesure : la latence affichée va du SIGHUP jusqu'à ce que chaque
+# processus concerné ait appliqué la configuration (ou, s'il a été relancé, écoute à nouveau)
+reload_pending = None # {'started', 'dispatched', 'waiting': [(p_info, indice dans startup)]}
+RELOAD_MEASURE_TIMEOUT = 30
+
+def build_targets(cfg):
+    """Décrit chaque honeypot (activation, fonction de démarrage, adresse et arguments) d'après la configuration."""
+    ssh_addr = (cfg.get('ssh_host', '0.0.0.0'), cfg.get('ssh_port', 2222))
+    http_addr = (cfg.get('http_host', '0.0.0.0'), cfg.get('http_port', 8080))
+    ftp_addr = (cfg.get('ftp_host', '0.0.0.0'), cfg.get('ftp_port', 2121))
+    return {
+        'SSH': {'enabled': cfg.get('enable_ssh', False), 'target': SERVICES['SSH'], 'addr': ssh_addr, 'args': ssh_addr},
+        'HTTP': {'enabled': cfg.get('enable_http', False), 'target': SERVICES['HTTP'], 'addr': http_addr, 'args': http_addr},
+        'FTP': {'enabled': cfg.get('enable_ftp', False), 'target': SERVICES['FTP'], 'addr': ftp_addr, 'args': ftp_addr + (cfg.get('ftp_root', 'ftp_trap_dir'),)}
+    }
+
+def get_listening_socket(name, addr):
+    """Renvoie le socket d'écoute du service, en le (re)créant si l'adresse a changé."""
+    current = listening_sockets.get(name)
+    if current and current['addr'] == addr:
+        return current['sock']
+    sock = socket.create_server(addr, backlog=100)
+    if current:
+        # Les processus en cours de drainage gardent leur propre copie du socket
+        current['sock'].close()
+    listening_sockets[name] = {'addr': addr, 'sock': sock}
+    return sock
+
+def close_listening_socket(name):
+    current = listening_sockets.pop(name, None)
+    if current:
+        current['sock'].close()
+
+def resolve_service(spec):
+    """Importe le module d'un honeypot et renvoie sa fonction de démarrage."""
+    module_name, function_name = spec.split(':')
+    return getattr(importlib.import_module(module_name), function_name)
+
+def run_worker(name, target, args, sock, sessions, startup, cfg):
+    """Point d'entrée d'un processus honeypot."""
+    # Ctrl+C est géré par le processus principal, qui arrête ensuite les honeypots
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # SIGTERM : arrêt progressif (drainage des sessions en cours)
+    signal.signal(signal.SIGTERM, lambda signum, frame: lifecycle.request_stop())
+    # SIGHUP : réglages modifiables à chaud, sans redémarrer le processus
+    signal.signal(signal.SIGHUP, lambda signum, frame: lifecycle.request_reload())
+    # Le fork hérite de tous les sockets d'écoute de run.py : ne garder que celui du service.
+    # Sinon, un port déplacé ou désactivé par un rechargement resterait en écoute dans un
+    # autre honeypot, acceptant des connexions sans jamais y répondre
+    for other in listening_sockets.values():
+        if other['sock'].fileno() != sock.fileno():
+            other['sock'].close()
+    listening_sockets.clear()
+    lifecycle.bind_session_counter(sessions)
+    lifecycle.bind_startup_times(startup)
+    try:
+        start = resolve_service(target)
+    except ImportError as e:
+        print(f"    - Honeypot {name} activé mais le module n'a pas pu être importé : {e}")
+        return
+    lifecycle.mark_imported()
+    lifecycle.reload(cfg)
+    # Démarré après l'import du service (ses hooks de rechargement sont alors enregistrés) ;
+    # un SIGHUP reçu entre-temps est appliqué dès le démarrage du thread
+    lifecycle.start_reload_watcher(CONFIG_PATH)
+    try:
+        start(*args, sock=sock)
+    finally:
+        # Le processus se termine par os._exit (multiprocessing) : sans fermeture explicite des
+        # handlers, les résumés d'agrégation en attente et les événements encore dans la file
+        # du forwarder seraient perdus à chaque arrêt ou drainage
+        logging.shutdown()
+
+def start_worker(name, info, cfg):
+    sock = get_listening_socket(name, info['addr'])
+    sessions = multiprocessing.Value('i', 0)
+    # Horodatages lancement / import / prêt, renseignés par le processus honeypot (cf. lifecycle)
+    startup = multiprocessing.Array('d', [time.time(), 0.0, 0.0, 0.0])
+    p = multiprocessing.Process(target=run_worker, args=(name, info['target'], info['args'], sock, sessions, startup, cfg), daemon=True)
+    p.start()
+    p_info = {'name': name, 'process': p, 'args': info['args'], 'sessions': sessions, 'startup': startup, 'state': 'running'}
+    processes.append(p_info)
+    return p_info
+
+def drain_worker(p_info):
+    """Demande l'arrêt progressif d'un processus : il n'accepte plus de connexions et termine les sessions en cours."""
+    p_info['state'] = 'draining'
+    p_info['drain_deadline'] = time.monotonic() + config.get('drain_timeout', 30)
+    if p_info['process'].is_alive():
+        p_info['process'].terminate()
+
+def reap_drained_workers():
+    """Retire les processus drainés, et force l'arrêt de ceux qui dépassent le délai de drainage."""
+    for p_info in list(processes):
+        if p_info['state'] != 'draining':
+            continue
+        if not p_info['process'].is_alive():
+            p_info['process'].join()
+            processes.remove(p_info)
+        elif time.monotonic() > p_info['drain_deadline']:
+            # Les sessions encore ouvertes sont perdues
+            reload_stats['dropped'] += max(p_info['sessions'].value, 0)
+            p_info['process'].kill()
+            p_info['process'].join()
+            processes.remove(p_info)
+
+def running_worker(name):
+    for p_info in processes:
+        if p_info['name'] == name and p_info['state'] == 'running':
+            return p_info
+    return None
+
+def request_reload(signum, frame):
+    global reload_requested
+    reload_requested = time.time()
+
+def reload_config():
+    """Recharge la configuration sans fermer les ports.
+
+    Les réglages modifiables à chaud (bannières, niveau de log) sont transmis aux processus
+    existants par SIGHUP. Un service dont l'adresse ou les arguments changent est relancé :
+    le nouveau processus hérite du socket d'écoute, puis l'ancien est drainé.
+    """
+    global config, reload_requested, reload_pending
+    started, reload_requested = reload_requested, None
+    try:
+        with open(CONFIG_PATH, 'r') as f:
+            new_config = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError) as e:
+        reload_stats['last_message'] = f"[red]Configuration invalide, rechargement ignoré : {e}[/]"
+        return
+
+    config = new_config
+    changes = []
+    waiting = []
+    for name, info in build_targets(new_config).items():
+        current = running_worker(name)
+        if not info['enabled']:
+            if current:
+                drain_worker(current)
+                close_listening_socket(name)
+                changes.append(f"{name} arrêté")
+        elif current and current['process'].is_alive() and current['args'] == info['args']:
+            os.kill(current['process'].pid, signal.SIGHUP)
+            waiting.append((current, lifecycle.STARTUP_RELOADED))
+        else:
+            try:
+                waiting.append((start_worker(name, info, new_config), lifecycle.STARTUP_READY))
+            except OSError as e:
+                # L'ancien processus (s'il existe) continue de servir
+                changes.append(f"[red]{name} non relancé : {e}[/]")
+                continue
+            if current:
+                drain_worker(current)
+            changes.append(f"{name} relancé")
+
+    reload_stats['count'] += 1
+    reload_pending = {'started': started, 'dispatched': time.time(), 'waiting': waiting}
+    update_reload_latency()
+    reload_stats['last_message'] = ", ".join(changes) if changes else "Réglages appliqués à chaud"
+
+def update_reload_latency():
+    """Termine la mesure du rechargement en cours quand tous les processus concernés sont prêts."""
+    global reload_pending
+    if reload_pending is None:
+        return
+    started = reload_pending['started']
+    done = [reload_pending['dispatched']]
+    for p_info, index in reload_pending['waiting']:
+        if not p_info['process'].is_alive():
+            continue # Processus mort : il ne sera jamais prêt
+        applied = p_info['startup'][index]
+        if applied < started:
+            if time.time() - started < RELOAD_MEASURE_TIMEOUT:
+                return # Encore en cours
+            reload_stats['last_message'] += f" [red]({p_info['name']} non prêt après {RELOAD_MEASURE_TIMEOUT} s)[/]"
+            applied = time.time()
+        done.append(applied)
+    reload_stats['last_latency_ms'] = (max(done) - started) * 1000
+    reload_pending = None
+
+def stop_workers():
+    """Arrête tous les processus honeypot et ferme les sockets d'écoute."""
     for p_info in processes:
         if p_info['process'].is_alive():
             print(f"    - Arrêt de {p_info['name']} (PID: {p_info['process'].pid})...")
             # Envoyer SIGTERM d'abord
             p_info['process'].terminate()
     
-    # Attendre un peu que les processus se terminent
-    time.sleep(2)
+    # Attendre un peu que les processus se terminent (2 s au plus)
+    deadline = time.monotonic() + 2
+    for p_info in processes:
+        p_info['process'].join(max(0, deadline - time.monotonic()))
     
     # Forcer l'arrêt si nécessaire (SIGKILL)
     for p_info in processes:
         if p_info['process'].is_alive():
             print(f"    - Forcer l'arrêt de {p_info['name']} (PID: {p_info['process'].pid})...")
             p_info['process'].kill()
-    
+
+    for name in list(listening_sockets):
+        close_listening_socket(name)
+
+def shutdown(signum, frame):
+    """Arrête proprement tous les processus honeypot."""
+    print("\n[*] Arrêt des honeypots...")
+    stop_workers()
     print("[*] Tous les honeypots sont arrêtés.")
     sys.exit(0)
 
 # Enregistrer les handlers de signaux pour un arrêt propre
 signal.signal(signal.SIGINT, shutdown)  # Ctrl+C
 signal.signal(signal.SIGTERM, shutdown) # kill
+if hasattr(signal, 'SIGHUP'):
+    signal.signal(signal.SIGHUP, request_reload) # Rechargement à chaud de la configuration
 
-# Configuration de l'affichage avec Rich
-console = Console()
-layout = Layout()
+def build_layout():
+    """Construit l'affichage Rich (importé ici : inutile avec --profile-startup)."""
+    from rich.layout import Layout
+    from rich.panel import Panel
 
-# Définir les zones du layout (par exemple, une pour chaque honeypot)
-layout.split_column(
-    Layout(name="header", size=3),
-    Layout(name="status", size=5), # Ajuster la taille si nécessaire
-    Layout(name="footer", size=1)
-)
+    layout = Layout()
 
-layout["header"].update(Panel("[bold cyan]Honeypot Lab Status[/]", title="Honeypot Control Panel", border_style="green"))
-layout["footer"].update(Panel("[italic grey50]Appuyez sur Ctrl+C pour arrêter[/]", border_style="red"))
+    # Définir les zones du layout (par exemple, une pour chaque honeypot)
+    layout.split_column(
+        Layout(name="header", size=3),
+        Layout(name="status", size=9), # Ajuster la taille si nécessaire
+        Layout(name="reload", size=3),
+        Layout(name="footer", size=1)
+    )
+
+    layout["header"].update(Panel("[bold cyan]Honeypot Lab Status[/]", title="Honeypot Control Panel", border_style="green"))
+    layout["footer"].update(Panel("[italic grey50]Appuyez sur Ctrl+C pour arrêter[/]", border_style="red"))
+    return layout
 
-def generate_status_table() -> Table:
+def generate_status_table():
     """Génère la table Rich affichant le statut des honeypots."""
+    from rich.table import Table
+
     table = Table(title="Statut des Modules Honeypot", show_header=True, header_style="bold magenta")
     table.add_column("Module", style="dim", width=12)
     table.add_column("Activé", justify="center")
     table.add_column("Statut", justify="center")
     table.add_column("PID", justify="right")
+    table.add_column("Sessions", justify="right")
 
     statuses = {}
     for p_info in processes:
+        if p_info['state'] != 'running':
+            continue
         is_alive = p_info['process'].is_alive()
+        draining = sum(1 for d in processes if d['name'] == p_info['name'] and d['state'] == 'draining')
         statuses[p_info['name']] = {
-            'status': "[bold green]Actif[/]" if is_alive else "[bold red]Arrêté[/]",
-            'pid': str(p_info['process'].pid) if is_alive else "-"
+            'status': ("[bold green]Actif[/]" if is_alive else "[bold red]Arrêté[/]") + (f" [yellow](+{draining} en drainage)[/]" if draining else ""),
+            'pid': str(p_info['process'].pid) if is_alive else "-",
+            'sessions': str(p_info['sessions'].value) if is_alive else "-"
         }
 
     # SSH
     ssh_enabled = config.get('enable_ssh', False)
-    ssh_status = statuses.get('SSH', {'status': "[yellow]Non démarré[/]", 'pid': "-"})
+    ssh_status = statuses.get('SSH', {'status': "[yellow]Non démarré[/]", 'pid': "-", 'sessions': "-"})
     table.add_row(
         "SSH",
         "[green]Oui[/]" if ssh_enabled else "[red]Non[/]",
         ssh_status['status'] if ssh_enabled else "[grey50]Désactivé[/]",
-        ssh_status['pid'] if ssh_enabled else "-"
+        ssh_status['pid'] if ssh_enabled else "-",
+        ssh_status['sessions'] if ssh_enabled else "-"
     )
 
     # HTTP
     http_enabled = config.get('enable_http', False)
-    http_status = statuses.get('HTTP', {'status': "[yellow]Non démarré[/]", 'pid': "-"})
+    http_status = statuses.get('HTTP', {'status': "[yellow]Non démarré[/]", 'pid': "-", 'sessions': "-"})
     table.add_row(
         "HTTP",
         "[green]Oui[/]" if http_enabled else "[red]Non[/]",
         http_status['status'] if http_enabled else "[grey50]Désactivé[/]",
-        http_status['pid'] if http_enabled else "-"
+        http_status['pid'] if http_enabled else "-",
+        http_status['sessions'] if http_enabled else "-"
     )
 
     # FTP
     ftp_enabled = config.get('enable_ftp', False)
-    ftp_status = statuses.get('FTP', {'status': "[yellow]Non démarré[/]", 'pid': "-"})
+    ftp_status = statuses.get('FTP', {'status': "[yellow]Non démarré[/]", 'pid': "-", 'sessions': "-"})
     table.add_row(
         "FTP",
         "[green]Oui[/]" if ftp_enabled else "[red]Non[/]",
         ftp_status['status'] if ftp_enabled else "[grey50]Désactivé[/]",
-        ftp_status['pid'] if ftp_enabled else "-"
+        ftp_status['pid'] if ftp_enabled else "-",
+        ftp_status['sessions'] if ftp_enabled else "-"
     )
 
     return table
 
+def generate_reload_panel():
+    """Génère le panneau des statistiques de rechargement à chaud (SIGHUP)."""
+    from rich.panel import Panel
+
+    latency = reload_stats['last_latency_ms']
+    if reload_pending is not None:
+        latency_text = "en cours..."
+    else:
+        latency_text = f'{latency:.1f} ms' if latency is not None else '-'
+    text = (
+        f"Rechargements : {reload_stats['count']}  |  "
+        f"Dernière latence : {latency_text}  |  "
+        f"Connexions coupées : {reload_stats['dropped']}  |  "
+        f"{reload_stats['last_message']}"
+    )
+    return Panel(text, title="Rechargement (kill -HUP)", border_style="blue")
+
+def profile_startup(timeout=30):
+    """Attend que tous les honeypots écoutent et affiche le temps de démarrage de chacun."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if all(p_info['startup'][lifecycle.STARTUP_READY] or not p_info['process'].is_alive() for p_info in processes):
+            break
+        time.sleep(0.005)
+
+    print("[*] Temps de démarrage (depuis le lancement de run.py) :")
+    print("    " + "Module".ljust(8) + "Lancé".rjust(10) + "Import".rjust(10) + "À l'écoute".rjust(13))
+    slowest = 0.0
+    for p_info in processes:
+        spawned, imported, ready = p_info['startup'][:]
+        if not ready:
+            print(f"    {p_info['name']:<8}{(spawned - STARTUP_T0) * 1000:>8.0f}ms{'-':>10}{'non prêt':>13}")
+            continue
+        slowest = max(slowest, ready - STARTUP_T0)
+        print(f"    {p_info['name']:<8}{(spawned - STARTUP_T0) * 1000:>8.0f}ms"
+              f"{(imported - spawned) * 1000:>8.0f}ms{(ready - STARTUP_T0) * 1000:>11.0f}ms")
+    print(f"[*] Tous les honeypots prêts en {slowest * 1000:.0f} ms")
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Lance les honeypots activés dans la configuration")
+    parser.add_argument('--profile-startup', action='store_true',
+                        help="Mesure le temps de démarrage de chaque honeypot (jusqu'à l'écoute), puis s'arrête")
+    cli_args = parser.parse_args()
+
     print("[*] Démarrage des honeypots configurés...")
 
-    honeypot_targets = {
-        'SSH': {'enabled': config.get('enable_ssh', False), 'target': start_ssh_honeypot, 'args': (config.get('ssh_host', '0.0.0.0'), config.get('ssh_port', 2222))},
-        'HTTP': {'enabled': config.get('enable_http', False), 'target': start_http_honeypot, 'args': (config.get('http_host', '0.0.0.0'), config.get('http_port', 8080))},
-        'FTP': {'enabled': config.get('enable_ftp', False), 'target': start_ftp_honeypot, 'args': (config.get('ftp_host', '0.0.0.0'), config.get('ftp_port', 2121), config.get('ftp_root', 'ftp_trap_dir'))}
-    }
+    honeypot_targets = build_targets(config)
 
     for name, info in honeypot_targets.items():
         if info['enabled']:
-            if info['target']:
-                print(f"    - Démarrage du honeypot {name}...")
-                p = multiprocessing.Process(target=info['target'], args=info['args'], daemon=True)
-                p.start()
-                processes.append({'name': name, 'process': p})
-                time.sleep(0.5) # Petit délai pour laisser le temps au processus de démarrer
-            else:
-                print(f"    - Honeypot {name} activé mais le module n'a pas pu être importé.")
+            print(f"    - Démarrage du honeypot {name}...")
+            try:
+                start_worker(name, info, config)
+            except OSError as e:
+                print(f"    - Impossible d'écouter sur {info['addr'][0]}:{info['addr'][1]} pour {name} : {e}")
+                continue
         else:
             print(f"    - Honeypot {name} désactivé dans la configuration.")
 
@@ -156,16 +408,30 @@ if __name__ == "__main__":
         print("[!] Aucun honeypot n'a été démarré. Vérifiez la configuration.")
         sys.exit(0)
 
+    if cli_args.profile_startup:
+        profile_startup()
+        stop_workers()
+        sys.exit(0)
+
     print("[*] Tous les honeypots actifs sont démarrés.")
 
+    from rich.live import Live
+    layout = build_layout()
+
     # Affichage du statut en direct avec Rich
     with Live(layout, refresh_per_second=1, screen=True, transient=True) as live:
         while True:
+            # Rechargement demandé par SIGHUP
+            if reload_requested is not None:
+                reload_config()
+            update_reload_latency()
+            reap_drained_workers()
             # Mettre à jour la table de statut
             layout["status"].update(generate_status_table())
+            layout["reload"].update(generate_reload_panel())
             # Vérifier si des processus se sont arrêtés inopinément
             for p_info in processes:
                 if not p_info['process'].is_alive():
                     # On pourrait ajouter une logique de redémarrage ici si nécessaire
                     pass # Le tableau indiquera qu'il est arrêté
-            time.sleep(1) 
\ No newline at end of file
+            time.sleep(0.2) # Boucle courte pour traiter rapidement les rechargements 
@@ -0,0 +1,306 @@
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import shutil
+import socket
+import sys
+import tempfile
+import threading
+import time
+
+# Rendre le package logutils importable (python scripts/bench_forwarder.py depuis la racine)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from logutils.forwarder import ForwardingHandler, make_transport
+from logutils.logger import JsonFormatter
+
+# Vérification et mesure du forwarder de logs (logutils/forwarder.py) contre un récepteur
+# TCP local :
+#   python scripts/bench_forwarder.py             # scénarios + débit
+#   python scripts/bench_forwarder.py --receive   # récepteur seul (ex: pour tester run.py)
+# Code de sortie non nul si un scénario échoue.
+
+
+class AckReceiver:
+    """Récepteur TCP de référence : lignes JSON, accusé cumulatif après chaque lecture.
+
+    Avec `close_after`, la connexion est fermée après ce nombre de lignes, sans accusé
+    pour la dernière lecture (récepteur qui tombe au milieu d'un lot). Avec `ack_delay`,
+    chaque accusé est retardé (destination lente).
+    """
+
+    def __init__(self, port, close_after=None, ack_delay=0.0):
+        self.port = port
+        self.close_after = close_after
+        self.ack_delay = ack_delay
+        self.lines = []
+        self._server = socket.create_server(('127.0.0.1', port))
+        self._server.settimeout(0.2)
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+
+    def _serve(self):
+        while not self._stopped.is_set():
+            try:
+                conn, _ = self._server.accept()
+            except socket.timeout:
+                continue
+            self._handle(conn)
+
+    def _handle(self, conn):
+        received, buffer = 0, b''
+        conn.settimeout(0.2)
+        with conn:
+            while not self._stopped.is_set():
+                try:
+                    data = conn.recv(65536)
+                except socket.timeout:
+                    continue
+                if not data:
+                    return
+                *lines, buffer = (buffer + data).split(b'\n')
+                if self.close_after is not None and len(self.lines) + len(lines) >= self.close_after:
+                    # Lignes lues mais jamais acquittées : l'émetteur doit les renvoyer
+                    self.lines.extend(lines[:max(self.close_after - len(self.lines), 0)])
+                    return
+                self.lines.extend(lines)
+                received += len(lines)
+                if lines:
+                    time.sleep(self.ack_delay)
+                    conn.sendall(f"{received}\n".encode('ascii'))
+
+    def messages(self):
+        return [json.loads(line)['message'] for line in self.lines]
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+        self._server.close()
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def make_handler(port, spool_directory, **options):
+    options.setdefault('batch_size', 500)
+    options.setdefault('flush_interval', 0.1)
+    options.setdefault('max_retry_delay', 0.5)
+    options.setdefault('queue_size', 200000)
+    handler = ForwardingHandler(make_transport('tcp', port=port, timeout=2.0), spool_directory, **options)
+    handler.setFormatter(logging.Formatter('{"message": "%(message)s"}'))
+    return handler
+
+
+def emit(handler, messages):
+    for message in messages:
+        handler.emit(logging.makeLogRecord({'msg': message}))
+
+
+def wait_for(condition, timeout=15.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.05)
+    return condition()
+
+
+def check(name, ok, detail=''):
+    print(f"[{'OK' if ok else 'ÉCHEC'}] {name}{' : ' + detail if detail else ''}")
+    return ok
+
+
+def in_order(received, expected):
+    """Vrai si `expected` est reçu en entier et dans l'ordre (doublons d'un renvoi tolérés)."""
+    position = 0
+    for message in received:
+        if position < len(expected) and message == expected[position]:
+            position += 1
+    return position == len(expected)
+
+
+def scenario_spool_then_replay(workdir, events):
+    """Destination indisponible : les événements vont dans le spool, puis sont rejoués dans l'ordre."""
+    port = free_port()
+    handler = make_handler(port, os.path.join(workdir, 'spool-replay'))
+    expected = [f"down-{i}" for i in range(events)]
+    emit(handler, expected)
+    spooled = wait_for(lambda: handler.spool is not None and handler.spool.pending() and handler.queue.empty())
+    receiver = AckReceiver(port)
+    try:
+        delivered = wait_for(lambda: len(receiver.lines) >= events and not handler.spool.pending())
+        return check("spool puis rejeu (destination coupée puis rétablie)",
+                     spooled and delivered and in_order(receiver.messages(), expected),
+                     f"{len(receiver.lines)}/{events} reçus")
+    finally:
+        handler.close()
+        receiver.stop()
+
+
+def _emit_then_exit(port, spool_directory, messages):
+    # Processus "honeypot" qui s'arrête avant d'avoir pu joindre la destination
+    handler = make_handler(port, spool_directory)
+    emit(handler, messages)
+    handler.close()
+
+
+def scenario_replay_after_restart(workdir, events):
+    """Un processus s'arrête avec des événements non livrés ; le suivant les rejoue au démarrage."""
+    port = free_port()
+    spool_directory = os.path.join(workdir, 'spool-restart')
+    expected = [f"before-restart-{i}" for i in range(events)]
+    child = multiprocessing.Process(target=_emit_then_exit, args=(port, spool_directory, expected))
+    child.start()
+    child.join()
+
+    receiver = AckReceiver(port)
+    handler = make_handler(port, spool_directory)
+    try:
+        emit(handler, ['after-restart'])
+        expected.append('after-restart')
+        delivered = wait_for(lambda: len(receiver.lines) >= len(expected) and not handler.spool.pending())
+        return check("rejeu après redémarrage",
+                     delivered and in_order(receiver.messages(), expected),
+                     f"{len(receiver.lines)}/{len(expected)} reçus")
+    finally:
+        handler.close()
+        receiver.stop()
+
+
+def scenario_receiver_drops_batch(workdir, events):
+    """Le récepteur ferme au milieu d'un lot : les lignes non acquittées sont renvoyées."""
+    port = free_port()
+    receiver = AckReceiver(port, close_after=events // 3)
+    handler = make_handler(port, os.path.join(workdir, 'spool-drop'), batch_size=50)
+    expected = [f"drop-{i}" for i in range(events)]
+    try:
+        emit(handler, expected)
+        wait_for(lambda: len(receiver.lines) >= events // 3)
+        partial = receiver.lines[:]
+        receiver.stop()
+        receiver = AckReceiver(port)
+        delivered = wait_for(lambda: in_order([json.loads(l)['message'] for l in partial] + receiver.messages(), expected)
+                             and not handler.spool.pending())
+        return check("récepteur fermé au milieu d'un lot (aucune perte)", delivered,
+                     f"{len(partial)} + {len(receiver.lines)} reçus pour {events} émis")
+    finally:
+        handler.close()
+        receiver.stop()
+
+
+def scenario_slow_destination(workdir, events):
+    """Destination lente (accusé après 300 ms) : la file se vide dans le spool, rien n'est abandonné."""
+    port = free_port()
+    receiver = AckReceiver(port, ack_delay=0.3)
+    handler = make_handler(port, os.path.join(workdir, 'spool-slow'), queue_size=10000)
+    expected = [f"slow-{i}" for i in range(events)]
+    try:
+        # Rafale plus grande que la file, émise plus vite que la destination n'acquitte
+        for i in range(0, events, 1000):
+            emit(handler, expected[i:i + 1000])
+            time.sleep(0.01)
+        spooled = wait_for(lambda: handler.queue.empty() and handler.spool is not None and handler.spool.pending())
+        delivered = wait_for(lambda: len(receiver.lines) >= events and not handler.spool.pending(), timeout=120.0)
+        return check("destination lente (rien d'abandonné, surplus dans le spool)",
+                     spooled and delivered and handler.dropped == 0 and in_order(receiver.messages(), expected),
+                     f"{len(receiver.lines)}/{events} reçus, {handler.dropped} abandonné(s)")
+    finally:
+        handler.close()
+        receiver.stop()
+
+
+def benchmark(workdir, events):
+    """Coût de emit() (chemin critique des honeypots) et débit de bout en bout."""
+    port = free_port()
+    receiver = AckReceiver(port)
+    handler = make_handler(port, os.path.join(workdir, 'spool-bench'))
+    records = [logging.makeLogRecord({'msg': f"bench-{i}"}) for i in range(events)]
+    try:
+        start = time.perf_counter()
+        for record in records:
+            handler.emit(record)
+        emitted = time.perf_counter() - start
+        delivered = wait_for(lambda: len(receiver.lines) >= events, timeout=120.0)
+        total = time.perf_counter() - start
+        print(f"[*] emit() : {emitted / events * 1e6:.1f} µs/événement")
+        print(f"[*] Débit de bout en bout (accusés reçus) : {events / total:,.0f} événements/s "
+              f"({len(receiver.lines)}/{events} en {total:.2f} s)")
+        return check("débit", delivered and handler.dropped == 0, f"{handler.dropped} abandonné(s)")
+    finally:
+        handler.close()
+        receiver.stop()
+
+
+def hot_path(workdir, events):
+    """Coût de logger.info() dans un honeypot : fichier JSON seul, puis fichier + forwarder."""
+    port = free_port()
+    receiver = AckReceiver(port)
+    file_handler = logging.FileHandler(os.path.join(workdir, 'hot_path.json'), encoding='utf-8')
+    file_handler.setFormatter(JsonFormatter())
+    forwarder = make_handler(port, os.path.join(workdir, 'spool-hot-path'))
+    forwarder.setFormatter(JsonFormatter())
+    logger = logging.getLogger('bench_forwarder')
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    extra = {'extra_data': {'ip': '203.0.113.7', 'user': 'root', 'pass': 'toor'}}
+    try:
+        costs = []
+        for handlers in ([file_handler], [file_handler, forwarder]):
+            logger.handlers = handlers
+            start = time.perf_counter()
+            for i in range(events):
+                logger.info("Tentative de connexion SSH", extra=extra)
+            costs.append((time.perf_counter() - start) / events * 1e6)
+            # Laisser le thread d'envoi rattraper avant la mesure suivante
+            wait_for(lambda: len(receiver.lines) >= events if forwarder in handlers else True, timeout=120.0)
+        print(f"[*] logger.info() : {costs[0]:.1f} µs/événement (fichier seul), "
+              f"{costs[1]:.1f} µs/événement (fichier + forwarder)")
+    finally:
+        logger.handlers = []
+        file_handler.close()
+        forwarder.close()
+        receiver.stop()
+
+
+def receive(port):
+    receiver = AckReceiver(port)
+    print(f"[*] Récepteur en écoute sur 127.0.0.1:{port} (Ctrl+C pour arrêter)")
+    try:
+        while True:
+            time.sleep(1)
+            print(f"    {len(receiver.lines)} ligne(s) reçue(s)")
+    except KeyboardInterrupt:
+        receiver.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Vérification et benchmark du forwarder de logs")
+    parser.add_argument('--events', type=int, default=2000, help="Événements par scénario")
+    parser.add_argument('--slow-events', type=int, default=50000, help="Événements pour le scénario destination lente")
+    parser.add_argument('--bench-events', type=int, default=100000, help="Événements pour la mesure de débit")
+    parser.add_argument('--receive', action='store_true', help="Lancer seulement le récepteur de référence")
+    parser.add_argument('--port', type=int, default=5140, help="Port du récepteur (--receive)")
+    args = parser.parse_args()
+
+    if args.receive:
+        receive(args.port)
+        sys.exit(0)
+
+    workdir = tempfile.mkdtemp(prefix='bench_forwarder_')
+    try:
+        results = [
+            scenario_spool_then_replay(workdir, args.events),
+            scenario_replay_after_restart(workdir, args.events),
+            scenario_receiver_drops_batch(workdir, args.events),
+            scenario_slow_destination(workdir, args.slow_events),
+            benchmark(workdir, args.bench_events),
+        ]
+        hot_path(workdir, args.bench_events // 2)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    sys.exit(0 if all(results) else 1)
@@ -2,22 +2,29 @@ from pyftpdlib.authorizers import DummyAuthorizer
 from pyftpdlib.handlers import FTPHandler
 from pyftpdlib.servers import FTPServer
 from logutils.logger import get_logger
+from services import lifecycle
 import os
 
 logger = get_logger('ftp')
 
-# Créer un répertoire "piège" si nécessaire, mais l'accès sera refusé
+# Répertoire "piège" par défaut (créé au démarrage du service), mais l'accès sera refusé
 FAKE_FTP_ROOT = 'ftp_trap_dir'
-os.makedirs(FAKE_FTP_ROOT, exist_ok=True)
+
+DEFAULT_FTP_BANNER = "220 ProFTPD 1.3.5 Server (Debian) [::ffff:127.0.0.1]"
 
 class HoneypotFTPHandler(FTPHandler):
     # Bannière personnalisée
-    banner = "220 ProFTPD 1.3.5 Server (Debian) [::ffff:127.0.0.1]"
+    banner = DEFAULT_FTP_BANNER
 
     def on_connect(self):
+        self._session_counted = True
+        lifecycle.session_opened()
         logger.info(f"Connexion FTP de {self.remote_ip}")
 
     def on_disconnect(self):
+        # on_disconnect est aussi appelé pour les connexions refusées (max_cons) sans on_connect
+        if getattr(self, '_session_counted', False):
+            lifecycle.session_closed()
         logger.info(f"Déconnexion FTP de {self.remote_ip}")
 
     def on_login(self, username):
@@ -97,8 +104,16 @@ class HoneypotFTPHandler(FTPHandler):
         logger.info(f"Commande FTP reçue: QUIT {line}", extra={'extra_data': {'ip': self.remote_ip, 'command': 'QUIT'}})
         super().ftp_QUIT(line)
 
-def start_ftp_honeypot(host='0.0.0.0', port=2121, ftp_root='ftp_trap_dir'):
-    """Démarre le serveur honeypot FTP avec un dossier racine piège."""
+@lifecycle.on_reload
+def apply_runtime_config(config):
+    """Réglages modifiables sans redémarrer le processus."""
+    HoneypotFTPHandler.banner = config.get('ftp_banner', DEFAULT_FTP_BANNER)
+
+def start_ftp_honeypot(host='0.0.0.0', port=2121, ftp_root=FAKE_FTP_ROOT, sock=None):
+    """Démarre le serveur honeypot FTP avec un dossier racine piège.
+
+    Si `sock` est fourni (socket d'écoute hérité de run.py), il est utilisé tel quel.
+    """
     try:
         os.makedirs(ftp_root, exist_ok=True)  # ✅ Crée le répertoire si absent
 
@@ -112,10 +127,18 @@ def start_ftp_honeypot(host='0.0.0.0', port=2121, ftp_root='ftp_trap_dir'):
         handler.authorizer = authorizer
         handler.passive_ports = range(60000, 60010)
 
-        server = FTPServer((host, port), handler)
+        server = FTPServer(sock if sock is not None else (host, port), handler)
         print(f"[*] Honeypot FTP écoute sur {host}:{port}")
         logger.info(f"Honeypot FTP démarré sur {host}:{port}")
-        server.serve_forever()
+        lifecycle.mark_ready()
+        # Boucle principale, en vérifiant régulièrement si un arrêt progressif est demandé
+        while not lifecycle.stopping.is_set():
+            server.ioloop.loop(timeout=1.0, blocking=False)
+
+        # Arrêt progressif : ne plus accepter de connexions et laisser finir les sessions en cours
+        server.close()
+        while lifecycle.active_sessions() > 0:
+            server.ioloop.loop(timeout=1.0, blocking=False)
 
     except Exception as e:
         logger.critical(f"Erreur critique du Honeypot FTP : {e}", exc_info=True)
@@ -1,18 +1,43 @@
 from flask import Flask, request, Response, make_response
+from werkzeug.serving import make_server
 from logutils.logger import get_logger
+from services import lifecycle
+from services.http_routes import DEFAULT_ROUTES_PATH, RouteTable
 import html
 import logging
+import threading
 
 logger = get_logger('http')
 
 app = Flask(__name__)
 
 # Bannière serveur trompeuse
-SERVER_BANNER = "Apache/2.4.41 (Ubuntu)"
+DEFAULT_SERVER_BANNER = "Apache/2.4.41 (Ubuntu)"
+SERVER_BANNER = DEFAULT_SERVER_BANNER
+
+# Table des chemins émulés (réponses statiques pré-calculées), chargée au démarrage
+route_table = None
+
+# Méthodes acceptées sur les chemins de la table (les scanners ne se limitent pas à GET)
+ROUTE_METHODS = ['GET', 'HEAD', 'POST', 'PUT', 'DELETE', 'PATCH']
+
+@lifecycle.on_reload
+def apply_runtime_config(config):
+    """Réglages modifiables sans redémarrer le processus."""
+    global SERVER_BANNER, route_table
+    SERVER_BANNER = config.get('http_server_banner', DEFAULT_SERVER_BANNER)
+    # Recharger la table et pré-calculer les réponses avec la nouvelle bannière. Si le fichier
+    # est devenu invalide, la table courante est conservée (la table minimale ne sert qu'au démarrage)
+    table = RouteTable.load(config.get('http_routes_file', DEFAULT_ROUTES_PATH), fallback=route_table is None)
+    if table is None:
+        logger.error("Rechargement de la table de routes HTTP impossible, table courante conservée")
+        table = RouteTable(route_table.spec)
+    route_table = table.render(SERVER_BANNER)
 
 @app.before_request
 def log_request_info():
     """Loggue chaque requête reçue avant de la traiter."""
+    lifecycle.session_opened()
     # Éviter de logger les requêtes pour favicon.ico trop souvent si désiré
     # if request.path == '/favicon.ico':
     #     return
@@ -34,10 +59,9 @@ def add_server_header(response):
     response.headers['Server'] = SERVER_BANNER
     return response
 
-@app.route('/', methods=['GET', 'POST'])
-def index():
-    """Page d'accueil simple."""
-    return f"<h1>Welcome</h1><p>Server running: {SERVER_BANNER}</p>"
+@app.teardown_request
+def end_request(exc):
+    lifecycle.session_closed()
 
 @app.route('/login', methods=['GET', 'POST'])
 def login():
@@ -85,14 +109,16 @@ def search():
     <p>No results found.</p> 
     '''
 
-@app.route('/admin')
-@app.route('/wp-login.php')
-@app.route('/phpmyadmin')
-def common_scan_paths():
-    """Intercepte les scans sur des chemins communs."""
-    logger.warning(f"Accès à un chemin sensible potentiel: {request.path}", extra={'extra_data': {'ip': request.remote_addr}})
-    # Répondre par un 404 Not Found pour ne pas trop en révéler
-    return "Not Found", 404
+@app.route('/', defaults={'path': ''}, methods=ROUTE_METHODS)
+@app.route('/<path:path>', methods=ROUTE_METHODS)
+def route_table_response(path):
+    """Sert les chemins de la table de routes (pages d'admin, .env, .git/config...) avec des réponses pré-calculées."""
+    cached = route_table.lookup(request.path)
+    if cached.alert:
+        logger.warning(f"Accès à un chemin sensible potentiel: {request.path}", extra={'extra_data': {'ip': request.remote_addr}})
+    if cached.status == 200 and request.if_none_match.contains(cached.etag):
+        return Response(status=304, headers=[('ETag', f'"{cached.etag}"')])
+    return Response(cached.body, status=cached.status, headers=cached.headers)
 
 # Fausse vulnérabilité Shellshock (exemple)
 @app.route('/cgi-bin/status')
@@ -106,8 +132,19 @@ def shellshock_cgi():
     return "OK", 200
 
 
-def start_http_honeypot(host='0.0.0.0', port=8080):
-    """Démarre le serveur honeypot HTTP avec Flask."""
+def _shutdown_on_stop(server):
+    """Arrête la boucle du serveur dès qu'un arrêt progressif est demandé."""
+    lifecycle.stopping.wait()
+    server.shutdown()
+
+def start_http_honeypot(host='0.0.0.0', port=8080, sock=None):
+    """Démarre le serveur honeypot HTTP avec Flask.
+
+    Si `sock` est fourni (socket d'écoute hérité de run.py), il est utilisé tel quel.
+    """
+    global route_table
+    if route_table is None:
+        route_table = RouteTable.load().render(SERVER_BANNER)
     print(f"[*] Honeypot HTTP écoute sur {host}:{port}")
     logger.info(f"Honeypot HTTP démarré sur {host}:{port}")
     try:
@@ -117,12 +154,19 @@ def start_http_honeypot(host='0.0.0.0', port=8080):
         log = logging.getLogger('werkzeug')
         log.disabled = True
         app.logger.disabled = True
-        # Lancer le serveur Flask
-        app.run(host=host, port=port, debug=False)
+        # Lancer le serveur Flask (multi-threadé, comme app.run)
+        server = make_server(host, port, app, threaded=True, fd=sock.fileno() if sock is not None else None)
+        # Garder une trace des threads de requêtes pour les attendre lors d'un arrêt progressif
+        server.daemon_threads = False
+        threading.Thread(target=_shutdown_on_stop, args=(server,), daemon=True).start()
+        lifecycle.mark_ready()
+        server.serve_forever()
     except Exception as e:
         logger.critical(f"Erreur critique du Honeypot HTTP : {e}", exc_info=True)
         print(f"[!] Erreur critique du Honeypot HTTP : {e}")
     finally:
+        if 'server' in locals():
+            server.server_close() # Attend la fin des requêtes en cours
         print("[*] Honeypot HTTP arrêté.")
         logger.info("Honeypot HTTP arrêté.")
 
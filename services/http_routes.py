@@ -0,0 +1,102 @@
+import hashlib
+import json
+
+DEFAULT_ROUTES_PATH = 'config/http_routes.json'
+
+# Table minimale utilisée si le fichier de routes est absent ou invalide
+FALLBACK_ROUTES = {
+    "routes": [
+        {"path": "/", "body": "<h1>Welcome</h1><p>Server running: {server_banner}</p>"},
+        {"paths": ["/admin", "/wp-login.php", "/phpmyadmin"], "status": 404, "body": "Not Found", "alert": True}
+    ],
+    "not_found": {"status": 404, "body": "Not Found"}
+}
+
+
+class CachedResponse:
+    """Réponse pré-calculée : corps encodé, en-têtes et ETag prêts à être renvoyés."""
+
+    __slots__ = ('template', 'status', 'content_type', 'extra_headers', 'alert', 'body', 'etag', 'headers')
+
+    def __init__(self, spec):
+        self.template = spec.get('body', '')
+        self.status = spec.get('status', 200)
+        self.content_type = spec.get('content_type', 'text/html; charset=utf-8')
+        self.extra_headers = list(spec.get('headers', {}).items())
+        self.alert = spec.get('alert', False)
+
+    def render(self, server_banner):
+        # Simple remplacement (et non str.format) : les corps peuvent contenir des accolades (JSON, PHP...)
+        self.body = self.template.replace('{server_banner}', server_banner).encode('utf-8')
+        self.etag = hashlib.sha1(self.body).hexdigest()[:16]
+        self.headers = [('Content-Type', self.content_type)] + self.extra_headers
+        # Comme Apache, pas d'ETag sur les pages d'erreur
+        if self.status == 200:
+            self.headers.append(('ETag', f'"{self.etag}"'))
+
+
+class RouteTable:
+    """Table des chemins émulés, chargée depuis un fichier JSON.
+
+    Les chemins exacts sont dans un dict ; les préfixes (`"prefix": "/.git/"`) sont cherchés
+    du plus long au plus court, segment par segment, soit un nombre de recherches qui dépend
+    de la profondeur du chemin et non de la taille de la table.
+    """
+
+    def __init__(self, spec):
+        self.spec = spec
+        self.exact = {}
+        self.prefixes = {}
+        self.responses = []
+        for route in spec.get('routes', []):
+            response = CachedResponse(route)
+            self.responses.append(response)
+            for path in route.get('paths', [route['path']] if 'path' in route else []):
+                self.exact[path] = response
+            if 'prefix' in route:
+                self.prefixes[route['prefix']] = response
+        self.not_found = CachedResponse(spec.get('not_found', FALLBACK_ROUTES['not_found']))
+        self.responses.append(self.not_found)
+
+    @classmethod
+    def load(cls, path=DEFAULT_ROUTES_PATH, fallback=True):
+        """Charge la table depuis `path`.
+
+        Si le fichier est absent ou invalide, renvoie la table minimale (`fallback`, au
+        démarrage) ou None (rechargement : l'appelant conserve la table courante).
+        """
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return cls(json.load(f))
+        except FileNotFoundError:
+            error = f"Fichier de routes HTTP {path} non trouvé."
+        except json.JSONDecodeError:
+            error = f"Erreur lors de la lecture de {path}."
+        except (AttributeError, KeyError, TypeError) as e:
+            error = f"Fichier de routes HTTP {path} mal formé ({e!r})."
+        if not fallback:
+            print(f"{error} Table de routes courante conservée.")
+            return None
+        print(f"{error} Utilisation de la table minimale.")
+        return cls(FALLBACK_ROUTES)
+
+    def render(self, server_banner):
+        """Pré-calcule toutes les réponses (à refaire si la bannière serveur change)."""
+        for response in self.responses:
+            response.render(server_banner)
+        return self
+
+    def lookup(self, path):
+        response = self.exact.get(path)
+        if response is None and len(path) > 1 and path.endswith('/'):
+            response = self.exact.get(path.rstrip('/'))
+        if response is not None:
+            return response
+        if self.prefixes:
+            end = path.rfind('/')
+            while end >= 0:
+                response = self.prefixes.get(path[:end + 1])
+                if response is not None:
+                    return response
+                end = path.rfind('/', 0, end)
+        return self.not_found
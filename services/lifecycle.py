@@ -0,0 +1,115 @@
+import json
+import threading
+import time
+from logutils.logger import get_logger, set_log_level
+
+# Cycle de vie d'un processus honeypot lancé par run.py :
+# - `stopping` est positionné sur SIGTERM, les services arrêtent alors d'accepter de nouvelles
+#   connexions et laissent se terminer les sessions en cours (drainage) ;
+# - sur SIGHUP, les réglages modifiables à chaud (bannières, niveau de log) sont réappliqués
+#   via les fonctions enregistrées avec `on_reload`, sans redémarrer le processus.
+# Les gestionnaires de signaux se contentent de positionner ces événements : le travail
+# (lecture de fichiers, logs, reconstruction de la table de routes) est fait hors du
+# gestionnaire, pour ne pas réentrer dans un handler de log interrompu.
+stopping = threading.Event()
+reload_requested = threading.Event()
+
+_reload_hooks = []
+
+# Compteur partagé (multiprocessing.Value) des sessions en cours, lu par run.py pour le drainage
+_sessions = None
+
+# Horodatages partagés avec run.py (multiprocessing.Array : lancement, import, prêt,
+# dernier rechargement à chaud appliqué)
+_startup = None
+STARTUP_SPAWNED, STARTUP_IMPORTED, STARTUP_READY, STARTUP_RELOADED = 0, 1, 2, 3
+
+
+def on_reload(hook):
+    """Enregistre une fonction appelée avec la configuration à chaque rechargement à chaud."""
+    _reload_hooks.append(hook)
+    return hook
+
+
+def reload(config):
+    """Applique les réglages modifiables à chaud."""
+    set_log_level(config.get('log_level', 'INFO'))
+    for hook in _reload_hooks:
+        hook(config)
+
+
+def reload_from_file(config_path='config/honeypot_config.json'):
+    """Relit la configuration et l'applique. En cas d'erreur, la configuration courante est conservée."""
+    try:
+        with open(config_path, 'r') as f:
+            config = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError) as e:
+        get_logger('lifecycle').error(f"Rechargement de la configuration impossible, configuration courante conservée : {e}")
+        return
+    reload(config)
+    mark_reloaded()
+    get_logger('lifecycle').info("Configuration rechargée à chaud")
+
+
+def request_reload():
+    """Demande un rechargement à chaud (appelé depuis le gestionnaire de SIGHUP)."""
+    reload_requested.set()
+
+
+def start_reload_watcher(config_path='config/honeypot_config.json'):
+    """Démarre le thread qui applique les rechargements demandés par `request_reload`."""
+    def watch():
+        while True:
+            reload_requested.wait()
+            reload_requested.clear()
+            reload_from_file(config_path)
+
+    threading.Thread(target=watch, name='config-reload', daemon=True).start()
+
+
+def request_stop():
+    """Demande un arrêt progressif du service."""
+    stopping.set()
+
+
+def bind_session_counter(counter):
+    global _sessions
+    _sessions = counter
+
+
+def bind_startup_times(times):
+    global _startup
+    _startup = times
+
+
+def mark_imported():
+    if _startup is not None:
+        _startup[STARTUP_IMPORTED] = time.time()
+
+
+def mark_ready():
+    """Signale que le service accepte des connexions (mesure du temps de démarrage)."""
+    if _startup is not None:
+        _startup[STARTUP_READY] = time.time()
+
+
+def mark_reloaded():
+    """Signale qu'un rechargement à chaud a été appliqué (mesure de la latence de rechargement)."""
+    if _startup is not None:
+        _startup[STARTUP_RELOADED] = time.time()
+
+
+def session_opened():
+    if _sessions is not None:
+        with _sessions.get_lock():
+            _sessions.value += 1
+
+
+def session_closed():
+    if _sessions is not None:
+        with _sessions.get_lock():
+            _sessions.value -= 1
+
+
+def active_sessions():
+    return _sessions.value if _sessions is not None else 0
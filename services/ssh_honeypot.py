@@ -2,6 +2,7 @@ import paramiko
 import socket
 import threading
 from logutils.logger import get_logger
+from services import lifecycle
 
 logger = get_logger('ssh')
 
@@ -9,25 +10,37 @@ logger = get_logger('ssh')
 # ssh-keygen -t rsa -b 2048 -f server_key -N ""
 # Vous DEVEZ générer votre propre clé et la placer dans le même répertoire
 # ou adapter le chemin.
-# Pour cet exemple, on suppose qu'une clé existe. Si elle n'existe pas, paramiko en générera une temporaire.
 HOST_KEY_PATH = 'server_key'
-try:
-    host_key = paramiko.RSAKey(filename=HOST_KEY_PATH)
-except FileNotFoundError:
-    print(f"Clé serveur RSA ({HOST_KEY_PATH}) non trouvée. Paramiko en générera une temporaire.")
-    # Alternative: Générer une clé si elle n'existe pas
-    # try:
-    #     host_key = paramiko.RSAKey.generate(2048)
-    #     host_key.write_private_key_file(HOST_KEY_PATH)
-    #     print(f"Nouvelle clé serveur RSA générée et sauvegardée: {HOST_KEY_PATH}")
-    # except Exception as e:
-    #     print(f"Impossible de générer ou sauvegarder la clé serveur: {e}")
-    #     exit(1)
-    # Pour l'instant, on laisse paramiko gérer la clé temporaire si elle manque.
-    host_key = paramiko.RSAKey.generate(2048) # Utilise une clé en mémoire
-
-
-SSH_BANNER = "SSH-2.0-OpenSSH_8.2p1 Ubuntu-4ubuntu0.1" # Bannière commune pour masquer
+host_key = None # Chargée au démarrage du service (et non à l'import : la génération est lente)
+
+def load_host_key():
+    """Charge la clé serveur RSA, ou en génère une si elle n'existe pas.
+
+    La clé générée est sauvegardée dans HOST_KEY_PATH : les redémarrages suivants sont plus rapides
+    et la clé présentée aux clients reste stable (un changement de clé trahit le honeypot).
+    """
+    try:
+        return paramiko.RSAKey(filename=HOST_KEY_PATH)
+    except FileNotFoundError:
+        print(f"Clé serveur RSA ({HOST_KEY_PATH}) non trouvée. Génération d'une nouvelle clé.")
+    key = paramiko.RSAKey.generate(2048)
+    try:
+        key.write_private_key_file(HOST_KEY_PATH)
+        print(f"Nouvelle clé serveur RSA générée et sauvegardée: {HOST_KEY_PATH}")
+    except Exception as e:
+        # Ex: répertoire en lecture seule, la clé reste en mémoire
+        print(f"Impossible de sauvegarder la clé serveur ({e}), utilisation d'une clé temporaire.")
+    return key
+
+
+DEFAULT_SSH_BANNER = "SSH-2.0-OpenSSH_8.2p1 Ubuntu-4ubuntu0.1" # Bannière commune pour masquer
+SSH_BANNER = DEFAULT_SSH_BANNER
+
+@lifecycle.on_reload
+def apply_runtime_config(config):
+    """Réglages modifiables sans redémarrer le processus."""
+    global SSH_BANNER
+    SSH_BANNER = config.get('ssh_banner', DEFAULT_SSH_BANNER)
 
 class SSHServerHandler (paramiko.ServerInterface):
     def __init__(self, client_address):
@@ -81,42 +94,58 @@ class SSHServerHandler (paramiko.ServerInterface):
         return False
 
 
-def start_ssh_honeypot(host='0.0.0.0', port=2222):
-    """Démarre le serveur honeypot SSH."""
+def start_ssh_honeypot(host='0.0.0.0', port=2222, sock=None):
+    """Démarre le serveur honeypot SSH.
+
+    Si `sock` est fourni (socket d'écoute hérité de run.py), il est utilisé tel quel.
+    """
+    global host_key
     try:
-        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        sock.bind((host, port))
-        sock.listen(100)
+        if host_key is None:
+            host_key = load_host_key()
+        if sock is None:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            sock.bind((host, port))
+            sock.listen(100)
+        # Timeout sur accept() pour vérifier régulièrement si un arrêt progressif est demandé
+        sock.settimeout(1.0)
         print(f"[*] Honeypot SSH écoute sur {host}:{port}")
         logger.info(f"Honeypot SSH démarré sur {host}:{port}")
+        lifecycle.mark_ready()
 
-        while True:
+        while not lifecycle.stopping.is_set():
             try:
                 client_socket, client_address = sock.accept()
-                print(f"[*] Connexion SSH reçue de {client_address[0]}:{client_address[1]}")
-                transport = paramiko.Transport(client_socket)
-                transport.local_version = SSH_BANNER # Définir la bannière
-                transport.add_server_key(host_key)
-
-                server_handler = SSHServerHandler(client_address)
-                transport.start_server(server=server_handler)
-
-                # Attendre la tentative d'authentification ou une déconnexion précoce
-                channel = transport.accept(20) # Timeout pour accepter un canal
-                if channel is None:
-                    # Souvent, le client se déconnecte après avoir vu les méthodes d'auth ou la clé
-                    logger.info(f"Client {client_address[0]} déconnecté avant authentification complète.")
-                else:
-                    # Si un canal est ouvert (ne devrait pas arriver avec notre config), logguer
-                    logger.warning(f"Canal inattendu ouvert par {client_address[0]}", extra={'extra_data': {'ip': client_address[0], 'channel_type': channel.get_name()}})
-
-
-                # Attendre que l'événement d'authentification soit signalé ou timeout
-                server_handler.event.wait(10) # Attendre max 10s après la connexion pour une tentative d'auth
-
-                transport.close() # Ferme la connexion proprement
-
+                lifecycle.session_opened()
+                try:
+                    print(f"[*] Connexion SSH reçue de {client_address[0]}:{client_address[1]}")
+                    transport = paramiko.Transport(client_socket)
+                    transport.local_version = SSH_BANNER # Définir la bannière
+                    transport.add_server_key(host_key)
+
+                    server_handler = SSHServerHandler(client_address)
+                    transport.start_server(server=server_handler)
+
+                    # Attendre la tentative d'authentification ou une déconnexion précoce
+                    channel = transport.accept(20) # Timeout pour accepter un canal
+                    if channel is None:
+                        # Souvent, le client se déconnecte après avoir vu les méthodes d'auth ou la clé
+                        logger.info(f"Client {client_address[0]} déconnecté avant authentification complète.")
+                    else:
+                        # Si un canal est ouvert (ne devrait pas arriver avec notre config), logguer
+                        logger.warning(f"Canal inattendu ouvert par {client_address[0]}", extra={'extra_data': {'ip': client_address[0], 'channel_type': channel.get_name()}})
+
+
+                    # Attendre que l'événement d'authentification soit signalé ou timeout
+                    server_handler.event.wait(10) # Attendre max 10s après la connexion pour une tentative d'auth
+
+                    transport.close() # Ferme la connexion proprement
+                finally:
+                    lifecycle.session_closed()
+
+            except socket.timeout:
+                continue
             except Exception as e:
                 ip = client_address[0] if 'client_address' in locals() else 'inconnu'
                 logger.error(f"Erreur lors du traitement de la connexion SSH de {ip}: {e}", exc_info=True)
@@ -127,7 +156,7 @@ def start_ssh_honeypot(host='0.0.0.0', port=2222):
         logger.critical(f"Erreur critique du Honeypot SSH : {e}", exc_info=True)
         print(f"[!] Erreur critique du Honeypot SSH : {e}")
     finally:
-        if 'sock' in locals():
+        if sock is not None:
             sock.close()
         print("[*] Honeypot SSH arrêté.")
         logger.info("Honeypot SSH arrêté.")